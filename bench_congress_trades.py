@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+의회 주식 거래 파이프라인 오프라인 벤치마크
+★ 네트워크 불필요 ★
+- 녹화된(또는 합성한) Capitol Trades 페이지 + 상원 aggregate를 로컬 HTTP 서버로 재생
+- 합성 거래 1k / 100k / 1M건 (SECTOR_MAP / POLITICIAN_INFO 어휘 사용)
+- 단계별 개별 측정: fetch → parse → normalize → dedupe → stats → write
+- 결과는 커밋 간 비교 가능한 JSON으로 저장
+
+사용법:
+  python bench_congress_trades.py                       # 1k, 100k 합성
+  python bench_congress_trades.py --sizes 1000,100000,1000000
+  python bench_congress_trades.py --record              # 실제 응답을 bench/fixtures에 녹화
+  python bench_congress_trades.py --fixtures bench/fixtures   # 녹화본 재생 포함
+"""
+
+import argparse
+import gc
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import fetch_congress_trades as fct
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BASE_DIR, "bench", "fixtures")
+DEFAULT_SIZES = "1000,100000"
+
+AMOUNT_RANGES = [
+    "$1,001 - $15,000", "$15,001 - $50,000", "$50,001 - $100,000", "$100,001 - $250,000",
+    "$250,001 - $500,000", "$500,001 - $1,000,000", "$1,000,001 - $5,000,000",
+]
+EXTRA_FIRST = ["John", "Mary", "James", "Linda", "Robert", "Susan", "David", "Karen"]
+OWNERS = [("self", "Self"), ("spouse", "Spouse"), ("joint", "Joint"), ("child", "Child")]
+
+
+# ═══════════════════════════════════════════════
+# SYNTHETIC DATA
+# ═══════════════════════════════════════════════
+def synthetic_raw(n, seed=42, dup_ratio=0.1):
+    """n건의 원본 레코드 → (Capitol Trades 항목, 상원 aggregate 항목)
+
+    절반씩 두 소스 형식으로 만들고, dup_ratio 비율은 같은 거래를 양쪽에 모두 넣어
+    소스 간 중복 제거 단계에도 일이 있게 한다.
+    """
+    rng = random.Random(seed)
+    members = [(name.split()[0], " ".join(name.split()[1:]), info["party"]) for name, info in fct.POLITICIAN_INFO.items()]
+    members += [(rng.choice(EXTRA_FIRST), surname, party) for surname, party in fct.EXTRA_PARTY.items()]
+    tickers = list(fct.SECTOR_MAP) + ["SPY", "KO", "PEP", "WMT", "T", "VZ"]
+    today = datetime.now()
+    capitol, senate = [], []
+
+    def trade():
+        first, last, party = rng.choice(members)
+        return {
+            "first": first, "last": last, "party": party, "ticker": rng.choice(tickers),
+            "date": (today - timedelta(days=rng.randint(0, 3 * 365))).strftime("%Y-%m-%d"),
+            "buy": rng.random() < 0.7, "amount": rng.choice(AMOUNT_RANGES), "owner": rng.choice(OWNERS),
+        }
+
+    def as_capitol(t):
+        disclosed = (datetime.strptime(t["date"], "%Y-%m-%d") + timedelta(days=rng.randint(10, 45))).strftime("%Y-%m-%d")
+        return {
+            "_txId": len(capitol) + 1,
+            "politician": {"firstName": t["first"], "lastName": t["last"],
+                           "party": "democrat" if t["party"] == "D" else "republican", "chamber": "house"},
+            "issuer": {"ticker": t["ticker"], "name": f"{t['ticker']} Holdings Inc"},
+            "txType": "buy" if t["buy"] else "sell", "txDate": t["date"], "filingDate": disclosed,
+            "txAmountRangeText": t["amount"], "owner": t["owner"][0],
+        }
+
+    def as_senate(t):
+        y, m, d = t["date"].split("-")
+        return {
+            "transaction_date": f"{m}/{d}/{y}", "owner": t["owner"][1], "ticker": t["ticker"],
+            "asset_description": f"{t['ticker']} Holdings Inc", "asset_type": "Stock",
+            "type": "Purchase" if t["buy"] else "Sale (Full)", "amount": t["amount"],
+            "first_name": t["first"], "last_name": t["last"],
+        }
+
+    while len(capitol) + len(senate) < n:
+        t = trade()
+        if rng.random() < dup_ratio:
+            capitol.append(as_capitol(t))
+            senate.append(as_senate(t))
+        elif rng.random() < 0.5:
+            capitol.append(as_capitol(t))
+        else:
+            senate.append(as_senate(t))
+    capitol.sort(key=lambda x: x["txDate"], reverse=True)
+    return capitol, senate
+
+
+def write_fixtures(root, capitol, senate):
+    """upstream 형식 그대로 디스크에 기록 (capitol/page-N.json, senate/all_transactions.json)"""
+    os.makedirs(os.path.join(root, "capitol"), exist_ok=True)
+    os.makedirs(os.path.join(root, "senate"), exist_ok=True)
+    size = fct.CT_PAGE_SIZE
+    pages = max(1, -(-len(capitol) // size))
+    for p in range(1, pages + 1):
+        body = {"data": capitol[(p - 1) * size:p * size],
+                "meta": {"paging": {"page": p, "size": size, "totalPages": pages, "totalItems": len(capitol)}}}
+        with open(os.path.join(root, "capitol", f"page-{p}.json"), "w", encoding="utf-8") as f:
+            json.dump(body, f, separators=(",", ":"))
+    with open(os.path.join(root, "senate", "all_transactions.json"), "w", encoding="utf-8") as f:
+        json.dump(senate, f, separators=(",", ":"))
+    return pages
+
+
+def record_fixtures(root, max_pages):
+    """실제 upstream 응답을 녹화 (벤치마크 재생용)"""
+    print(f"🎙️ 녹화: {root}")
+    os.makedirs(os.path.join(root, "capitol"), exist_ok=True)
+    os.makedirs(os.path.join(root, "senate"), exist_ok=True)
+    fct.HTTP_CACHE.enabled = False
+    for p in range(1, max_pages + 1):
+        data = fct.fetch_with_retry(fct.ct_page_url(p), f"Capitol Trades p{p}")
+        if not data or not data.get("data"):
+            break
+        with open(os.path.join(root, "capitol", f"page-{p}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        print(f"    ✅ 페이지 {p}: {len(data['data'])}건")
+    meta = fct.fetch_cached(fct.SENATE_URL, "GitHub Senate")
+    if meta:
+        shutil.copyfile(meta["body_path"], os.path.join(root, "senate", "all_transactions.json"))
+        print(f"    ✅ 상원 aggregate: {meta['size']/1024/1024:.1f}MB")
+
+
+# ═══════════════════════════════════════════════
+# LOCAL STAND-IN SERVER
+# ═══════════════════════════════════════════════
+class FixtureServer:
+    """fixture 디렉터리를 Capitol Trades / GitHub raw 대신 서빙하는 로컬 HTTP 서버
+
+    HTTP/1.1 keep-alive, Accept-Encoding: gzip이면 압축본 응답 (실제 서버처럼).
+    bytes_sent = 전송한 본문 바이트, connections = 수락한 연결 수.
+    """
+    def __init__(self, root):
+        self.root = root
+        handler = self._handler()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.bytes_sent = self.connections = 0
+        self.gz = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 헤더/본문 두 번의 write가 Nagle + delayed ACK로 40ms씩 묶이지 않게
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server.lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                if u.path == "/trades":
+                    page = int(parse_qs(u.query).get("page", ["1"])[0])
+                    path = os.path.join(server.root, "capitol", f"page-{page}.json")
+                else:
+                    path = os.path.join(server.root, "senate", "all_transactions.json")
+                if not os.path.exists(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    body = f.read()
+                gz = "gzip" in (self.headers.get("Accept-Encoding") or "")
+                if gz:
+                    with server.lock:
+                        if path not in server.gz:
+                            server.gz[path] = gzip.compress(body, 6, mtime=0)
+                    body = server.gz[path]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if gz:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def base(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ═══════════════════════════════════════════════
+# STAGES
+# ═══════════════════════════════════════════════
+def timed(results, dataset, stage, fn, records=len):
+    """fn() 실행 시간 측정. records는 건수 또는 결과 → 건수 함수"""
+    gc.collect()
+    start = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - start
+    n = records(out) if callable(records) else records
+    results.append({"dataset": dataset, "stage": stage, "records": n, "seconds": round(secs, 4),
+                    "records_per_sec": round(n / secs, 1) if secs > 0 else None})
+    print(f"    ⏱️ {stage:<9} {n:>9}건 {secs:8.3f}s")
+    return out
+
+
+def bench_dataset(results, dataset, fixture_root, work, concurrency):
+    """fixture 한 세트에 대해 6단계를 각각 측정"""
+    print(f"  📦 {dataset}")
+    fct.HTTP_CACHE = fct.HttpCache(os.path.join(work, "cache"))
+    pages = len([n for n in os.listdir(os.path.join(fixture_root, "capitol")) if n.endswith(".json")])
+
+    with FixtureServer(fixture_root) as srv:
+        fct.CT_API_URL = f"{srv.base}/trades"
+        fct.SENATE_URL = f"{srv.base}/aggregate/all_transactions.json"
+
+        def fetch():
+            urls = [fct.ct_page_url(p) for p in range(1, pages + 1)] + [fct.SENATE_URL]
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                return [m for m in pool.map(fct.fetch_cached, urls) if m]
+        metas = timed(results, dataset, "fetch", fetch)
+        results[-1].update(bytes=srv.bytes_sent, connections=srv.connections)
+
+    page_metas, senate_meta = metas[:-1], metas[-1]
+
+    def parse():
+        capitol = []
+        for m in page_metas:
+            with open(m["body_path"], "rb") as f:
+                capitol.extend(json.load(f).get("data") or [])
+        with open(senate_meta["body_path"], "rb") as f:
+            senate = list(fct.iter_json_array(f))
+        return capitol, senate
+    capitol_raw, senate_raw = timed(results, dataset, "parse", parse, records=lambda out: len(out[0]) + len(out[1]))
+
+    def normalize():
+        fct.RESOLVER.resolve.cache_clear()
+        fct.get_sector.cache_clear()
+        ct = fct.uniquify_ids([t for t in map(fct.normalize_capitol_item, capitol_raw) if t])
+        sn = fct.uniquify_ids(list(fct.iter_senate_trades(senate_raw)))
+        return ct, sn
+    ct, sn = timed(results, dataset, "normalize", normalize, records=len(capitol_raw) + len(senate_raw))
+    del capitol_raw, senate_raw
+
+    def dedupe():
+        fct.member_key.cache_clear()
+        kept, drop, merges = fct.dedupe_batch(sn, ct)
+        return ct + kept, merges
+    trades, merges = timed(results, dataset, "dedupe", dedupe, records=len(ct) + len(sn))
+    results[-1]["merges"] = dict(merges)
+
+    n = len(trades)
+    table = timed(results, dataset, "table", lambda: fct.TradeTable.from_trades(trades), records=n)
+    del trades
+    timed(results, dataset, "stats", lambda: fct.compute_stats(table), records=n)
+
+    def write():
+        # (date, id) 내림차순 = 저장소 query 순서와 동일 (안정 정렬 두 번)
+        ordered = table.sorted_by("id", reverse=True).sorted_by("date", reverse=True)
+        out_dir = os.path.join(work, "out")
+        indexer = fct.TradeIndexer()
+        manifest, _ = fct.write_shards(out_dir, indexer.feed_months(fct.group_by_month(ordered)), "bench")
+        raw = json.dumps(indexer.to_dict(), separators=(",", ":")).encode("utf-8")
+        fct._write_compressed(os.path.join(out_dir, "index.json"), raw)
+        return manifest
+    timed(results, dataset, "write", write, records=n)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="의회 주식 거래 파이프라인 오프라인 벤치마크")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"합성 데이터 건수 (쉼표 구분, 기본 {DEFAULT_SIZES})")
+    ap.add_argument("--fixtures", help="녹화된 fixture 디렉터리 (capitol/page-N.json, senate/all_transactions.json)")
+    ap.add_argument("--record", action="store_true", help="실제 응답을 --fixtures(기본 bench/fixtures)에 녹화 후 종료")
+    ap.add_argument("--record-pages", type=int, default=fct.CT_MAX_PAGES, help="녹화할 Capitol Trades 페이지 수")
+    ap.add_argument("--concurrency", type=int, default=fct.CT_CONCURRENCY, help="fetch 단계 동시 요청 수")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=os.path.join(BASE_DIR, "bench_results.json"), help="결과 JSON 경로")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.record:
+        record_fixtures(args.fixtures or FIXTURE_DIR, args.record_pages)
+        return
+    print("🏁 파이프라인 벤치마크 시작")
+    results = []
+    work = tempfile.mkdtemp(prefix="ct-bench-")
+    try:
+        if args.fixtures:
+            bench_dataset(results, "recorded", args.fixtures, os.path.join(work, "recorded"), args.concurrency)
+        for n in (int(x) for x in args.sizes.split(",") if x.strip()):
+            root = os.path.join(work, f"synthetic-{n}")
+            capitol, senate = synthetic_raw(n, seed=args.seed)
+            write_fixtures(os.path.join(root, "fixtures"), capitol, senate)
+            del capitol, senate
+            bench_dataset(results, f"synthetic-{n}", os.path.join(root, "fixtures"), root, args.concurrency)
+            shutil.rmtree(root, ignore_errors=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 결과: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,52 @@
 - 소스1: Capitol Trades (capitoltrades.com) 공개 API
 - 소스2: GitHub 오픈소스 상원 데이터 (timothycarambat)
 - 소스3: 내장 최신 데이터 (fallback)
+- 일별 가격: prices/<TICKER>.csv (Date + Close 또는 Adj Close 컬럼, Yahoo Finance 내보내기 형식)를
+  커밋해 두면 data/prices/<TICKER>.bin으로 변환해 거래일/공시일 종가를 붙인다 (없으면 가격 단계 생략)
 """
 
+import argparse
+import bisect
+import codecs
+import cProfile
+import csv
+import gzip
+import hashlib
+import http.client
 import json
+import mmap
 import os
+import queue
+import random
+import sqlite3
+import struct
 import sys
+import threading
 import time
-from datetime import datetime, timedelta
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
+import tracemalloc
+import unicodedata
+import zlib
+from array import array
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from json.encoder import encode_basestring
+from operator import itemgetter
+from urllib.parse import urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+try:
+    import brotli  # 선택: .br 사전 압축본
+except ImportError:
+    brotli = None
+
+try:
+    import resource  # 최대 RSS (Unix 전용)
+except ImportError:
+    resource = None
 
 # ═══════════════════════════════════════════════
 # POLITICIAN INFO + MAPPINGS
@@ -130,6 +167,9 @@ SECTOR_JURISDICTION_MAP = {
     "전기차": "친환경·EV 보조금", "미디어": "통신·미디어 규제",
     "금융": "은행규제·핀테크", "에너지": "에너지·화석연료",
     "헬스케어": "보건예산·의약품 규제", "광업": "광물 규제·환경정책",
+    "통신": "통신·주파수 정책", "산업재": "인프라·제조업 정책", "운송": "교통·항공 규제",
+    "소비재": "소비자 보호·무역", "필수소비재": "식품·농업 정책", "소재": "화학·환경 규제",
+    "유틸리티": "전력망·에너지 규제", "부동산": "주택·부동산 정책",
 }
 
 PARTY_MAP = {}
@@ -145,42 +185,1079 @@ EXTRA_PARTY = {
     "Hagerty":"R","Hill":"R","Fallon":"R","Gimenez":"R","Meuser":"R",
 }
 PARTY_MAP.update(EXTRA_PARTY)
+# 소스별 표기 차이 (별칭 → POLITICIAN_INFO 정식 이름)
+POLITICIAN_ALIASES = {
+    "Thomas Tuberville": "Tommy Tuberville", "Mike McCaul": "Michael McCaul",
+    "Dan Goldman": "Daniel Goldman", "Rohit Khanna": "Ro Khanna",
+    "Richard Scott": "Rick Scott", "Deborah Wasserman Schultz": "Debbie Wasserman Schultz",
+    "Marjorie Greene": "Marjorie Taylor Greene", "Joshua Gottheimer": "Josh Gottheimer",
+    "Daniel Crenshaw": "Dan Crenshaw",
+}
+
+# 소스 URL
+CT_API_URL = "https://bff.capitoltrades.com/trades"
+SENATE_URL = "https://raw.githubusercontent.com/timothycarambat/senate-stock-watcher-data/master/aggregate/all_transactions.json"
+
+# Capitol Trades 페이징 설정
+CT_PAGE_SIZE = 96
+CT_MAX_PAGES = 5        # 기본 수집 페이지 수 (0 = 전체)
+CT_CONCURRENCY = 4      # 동시 요청 수
+CT_RATE = 2.0           # 초당 최대 요청 수
+FETCH_RETRIES = 3
+
+# HTTP 클라이언트 (호스트별 keep-alive 연결 풀)
+HTTP_CONNECT_TIMEOUT = 10   # TCP+TLS 연결 타임아웃 (초)
+HTTP_READ_TIMEOUT = 60      # 소켓 읽기 타임아웃 (초)
+HTTP_POOL_SIZE = 8          # 호스트당 유휴 연결 최대 수
+HTTP_MAX_REDIRECTS = 5
+RETRY_AFTER_MAX = 120       # Retry-After 최대 대기 (초)
+
+# 수집 파이프라인 (소스별 producer → 제한 큐 → 정규화/중복 제거 consumer)
+PIPELINE_BATCH = 1000   # 큐 한 칸에 담는 원본 레코드 수
+PIPELINE_QUEUE = 32     # 큐 최대 배치 수 (가득 차면 producer 대기)
+
+# 전체 히스토리 백필 (--backfill): 원본 청크를 프로세스 풀에서 정규화
+BACKFILL_CHUNK = 5000   # 상원 청크 크기 (Capitol Trades는 페이지 = 청크)
+
+# HTTP 디스크 캐시 (ETag/Last-Modified 조건부 GET)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_MAX_AGE_DAYS = 30
+NORMALIZE_VERSION = 3   # 정규화 로직 변경 시 증가 → 정규화 캐시 무효화
+STREAM_CHUNK = 1 << 16
+METRICS_PATH = os.path.join(CACHE_DIR, "run_metrics.json")  # data/ 밖: 매 실행 바뀌어도 커밋 유발 안 함
+SLOW_STAGE_RATIO = 2.0   # 직전 실행 대비 이 배수 이상 느려진 단계는 경고
+
+# 영구 거래 저장소 (전체 히스토리) — data/ 밖 + .gitignore: 바이너리를 매 실행 커밋하지 않고
+# CI에서는 actions/cache로 복원한다. .cache/는 prune 대상이라 별도 디렉터리에 둔다
+STATE_DIR = os.path.join(BASE_DIR, ".state")
+STORE_PATH = os.path.join(STATE_DIR, "trades.db")
+LEGACY_STORE_PATH = os.path.join(BASE_DIR, "data", "trades.db")
+
+# 일별 가격 (prices/<TICKER>.csv → data/prices/<TICKER>.bin). prices/는 자동으로 채워지지 않는 입력
+# 디렉터리 — 필요한 티커의 일별 CSV를 직접 커밋한다 (형식 예: bench/fixtures/prices/)
+PRICE_CSV_DIR = os.path.join(BASE_DIR, "prices")
+PRICE_BIN_DIR = os.path.join(BASE_DIR, "data", "prices")
+PRICE_TOLERANCE_DAYS = 5   # 거래일이 휴장일이면 직전 5일 이내 종가 사용
+
+# 티커 참조 (reference/*.csv → .state/tickers.bin, 처음 섹터를 조회할 때 mmap, 커밋하지 않는 파생 파일)
+REFERENCE_DIR = os.path.join(BASE_DIR, "reference")
+TICKER_INDEX_PATH = os.path.join(STATE_DIR, "tickers.bin")
+
+
+# ═══════════════════════════════════════════════
+# RUN METRICS
+# ═══════════════════════════════════════════════
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class RunMetrics:
+    """단계별 시간/처리량/메모리 + fetch 호출별 상태·바이트·재시도 기록"""
+    def __init__(self):
+        self.started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.t0 = time.perf_counter()
+        self.stages, self.requests, self.warnings = [], [], []
+        self.retries = Counter()
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.tracemalloc = False
+
+    @contextmanager
+    def stage(self, name, records_in=None):
+        """with METRICS.stage("이름") as st: ... st["records_out"] = n"""
+        rec = {"name": name, "records_in": records_in, "records_out": None}
+        n_req = len(self.requests)
+        start = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            secs = time.perf_counter() - start
+            n = rec["records_in"] if rec["records_in"] is not None else rec["records_out"]
+            rec.update(seconds=round(secs, 4), records_per_sec=round(n / secs, 1) if n and secs > 0 else None,
+                       requests=len(self.requests) - n_req, peak_rss_mb=peak_rss_mb())
+            with self.lock:
+                self.stages.append(rec)
+
+    def request(self, label, url, status, nbytes, seconds, error=None):
+        with self.lock:
+            self.requests.append({"label": label, "url": url, "status": status, "bytes": nbytes,
+                                  "seconds": round(seconds, 4), "error": error})
+
+    def retry(self, label):
+        with self.lock:
+            self.retries[label] += 1
+
+    def connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def warn(self, msg):
+        print(f"  ⚠️ {msg}")
+        with self.lock:
+            self.warnings.append(msg)
+
+    def compare(self, previous):
+        """직전 실행보다 SLOW_STAGE_RATIO배 이상(1초 이상) 느려진 단계 경고"""
+        before = {s["name"]: s.get("seconds") or 0 for s in (previous or {}).get("stages", [])}
+        for s in self.stages:
+            old = before.get(s["name"])
+            if old and s["seconds"] >= 1 and s["seconds"] >= old * SLOW_STAGE_RATIO:
+                self.warn(f"단계 '{s['name']}' 느려짐: {old:.2f}s → {s['seconds']:.2f}s")
+
+    def to_dict(self):
+        statuses = Counter(str(r["status"]) for r in self.requests)
+        return {
+            "started_at": self.started,
+            "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            # 수집 단계는 소스별로 겹쳐 실행되므로 단계 합이 아닌 실제 경과 시간
+            "total_seconds": round(time.perf_counter() - self.t0, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            # tracemalloc 최대치는 프로세스 전체 값이라 단계가 겹치면 단계별로 나눌 수 없음 → 실행 전체 1개
+            "traced_peak_mb": round(tracemalloc.get_traced_memory()[1] / 1048576, 1) if self.tracemalloc else None,
+            "http": {"requests": len(self.requests), "connections": self.connections,
+                     "bytes": sum(r["bytes"] for r in self.requests),
+                     "statuses": dict(statuses), "retries": dict(self.retries),
+                     "errors": sum(1 for r in self.requests if r["error"])},
+            "stages": self.stages, "requests": self.requests, "warnings": self.warnings,
+        }
+
+    def write(self, path=METRICS_PATH):
+        previous = None
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                pass
+        self.compare(previous)
+        _atomic_write(path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def write_step_summary(self, path=None):
+        """GitHub Actions 작업 요약($GITHUB_STEP_SUMMARY)에 단계표 + 경고를 덧붙임 (Actions 밖에서는 생략)"""
+        path = path or os.environ.get("GITHUB_STEP_SUMMARY")
+        if not path:
+            return False
+        d = self.to_dict()
+        lines = ["### 📈 수집 실행 지표", "",
+                 f"총 {d['total_seconds']:.1f}s · HTTP {d['http']['requests']}건 "
+                 f"({d['http']['bytes'] / 1048576:.1f}MB, 재시도 {sum(d['http']['retries'].values())}, "
+                 f"오류 {d['http']['errors']}) · 최대 RSS {d['peak_rss_mb']}MB", "",
+                 "| 단계 | 시간(s) | 건수 | 건/s |", "|---|---:|---:|---:|"]
+        for s in self.stages:
+            n = s["records_in"] if s["records_in"] is not None else s["records_out"]
+            rate = f"{s['records_per_sec']:,.0f}" if s["records_per_sec"] else "-"
+            lines.append(f"| {s['name']} | {s['seconds']:.2f} | {n if n is not None else '-'} | {rate} |")
+        lines += [""] + [f"> ⚠️ {w}" for w in self.warnings]
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return True
+
+    def print_summary(self):
+        print("⏱️ 단계별:")
+        for s in self.stages:
+            n = s["records_in"] if s["records_in"] is not None else s["records_out"]
+            rate = f"{s['records_per_sec']:,.0f}건/s" if s["records_per_sec"] else "-"
+            print(f"   {s['name']:<22} {s['seconds']:8.2f}s  {n if n is not None else '-':>8}건  {rate:>12}  RSS {s['peak_rss_mb']}MB")
+
+
+METRICS = RunMetrics()
+
+
+# ═══════════════════════════════════════════════
+# HTTP CACHE
+# ═══════════════════════════════════════════════
+class HttpCache:
+    """URL별 응답 본문 + 검증자(ETag/Last-Modified) 디스크 캐시
+
+    http/<url해시>.json  : 메타데이터 (etag, last_modified, sha256, size)
+    http/<url해시>.body  : 응답 본문
+    norm/<키>.jsonl      : 본문 해시 기준 정규화 결과 캐시 (헤더 한 줄 + 거래 한 줄씩)
+    offline=True 이면 네트워크 없이 캐시만 사용한다.
+    enabled=False 이면 캐시를 조회하지 않는다 (본문은 스트리밍 파싱을 위해 계속 기록).
+    """
+    def __init__(self, root, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.offline = False
+        self.enabled = True
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        d = os.path.join(self.root, "http")
+        return os.path.join(d, key + ".json"), os.path.join(d, key + ".body")
+
+    def lookup(self, url):
+        meta_path, body_path = self._paths(url)
+        if not self.enabled or not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta["body_path"] = body_path
+        return meta
+
+    def touch(self, url):
+        for p in self._paths(url):
+            if os.path.exists(p):
+                os.utime(p)
+
+    def store(self, url, stream, headers):
+        """응답 스트림을 청크 단위로 디스크에 기록 (본문 전체를 메모리에 올리지 않음)"""
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        tmp = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        digest, size = hashlib.sha256(), 0
+        with open(tmp, "wb") as f:
+            while True:
+                chunk = stream.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        os.replace(tmp, body_path)
+        meta = {
+            "url": url, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+            "sha256": digest.hexdigest(), "size": size,
+            "stored_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        meta["body_path"] = body_path
+        return meta
+
+    def _norm_path(self, key):
+        return os.path.join(self.root, "norm", key + ".jsonl")
+
+    def open_normalized(self, key):
+        """정규화 캐시 → (헤더 dict, 열린 파일 — 이후 한 줄 = 거래 하나) | None. 파일은 호출자가 닫는다"""
+        p = self._norm_path(key)
+        if not self.enabled or not os.path.exists(p):
+            return None
+        try:
+            f = open(p, encoding="utf-8")
+        except OSError:
+            return None
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            f.close()
+            return None
+        os.utime(p)
+        return header, f
+
+    def normalized_writer(self, key, header):
+        """정규화 캐시 기록기 (캐시 비활성화면 None). commit() 전까지는 임시 파일"""
+        return _JsonLinesWriter(self._norm_path(key), header) if self.enabled else None
+
+    def prune(self):
+        """오래된 항목 삭제 후, 총 용량이 max_bytes 이하가 될 때까지 LRU(mtime) 순으로 삭제"""
+        if not os.path.isdir(self.root):
+            return 0
+        now, files = time.time(), []
+        for dirpath, _, names in os.walk(self.root):
+            for n in names:
+                p = os.path.join(dirpath, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        removed, total = 0, sum(f[1] for f in files)
+        for mtime, size, p in sorted(files):
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                removed += 1
+                total -= size
+            except OSError:
+                pass
+        return removed
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class _JsonLinesWriter:
+    """배치 단위로 덧붙여 쓰는 JSON lines 임시 파일 → commit()에서 원자적 교체, discard()면 삭제"""
+    def __init__(self, path, header):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path, self.tmp = path, f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.f = open(self.tmp, "w", encoding="utf-8")
+        self.write([header])
+
+    def write(self, records):
+        self.f.writelines(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+
+    def commit(self):
+        self.f.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self):
+        self.f.close()
+        os.remove(self.tmp)
+
+
+VOLATILE_KEYS = ("updated_at", "content_sha256")
+
+
+def content_hash(payload, volatile=VOLATILE_KEYS):
+    """시각 등 매 실행 바뀌는 키를 뺀 정규화 JSON(sort_keys)의 sha256"""
+    canon = {k: v for k, v in payload.items() if k not in volatile}
+    raw = json.dumps(canon, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=list)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def read_content_hash(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("content_sha256")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def write_if_changed(path, payload, **dump_kw):
+    """내용 해시(content_sha256)가 기존 파일과 같으면 쓰지 않음 (updated_at도 이전 값 유지)
+
+    payload에 content_sha256을 넣어 원자적으로 기록한다. 반환: (기록 여부, 해시)
+    """
+    digest = content_hash(payload)
+    payload["content_sha256"] = digest
+    if read_content_hash(path) == digest:
+        return False, digest
+    _atomic_write(path, json.dumps(payload, ensure_ascii=False, **dump_kw).encode("utf-8"))
+    return True, digest
+
+
+HTTP_CACHE = HttpCache(CACHE_DIR)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "application/json, text/html, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class HttpResponse:
+    """응답 본문 스트림. gzip/deflate는 읽는 즉시 청크 단위로 해제한다
+
+    본문을 끝까지 읽으면 연결을 풀에 돌려준다 (중간에 close()하면 연결은 버림).
+    wire_bytes = 네트워크로 받은(압축된) 바이트 수.
+    """
+    def __init__(self, client, key, conn, resp):
+        self.client, self.key, self.conn, self.resp = client, key, conn, resp
+        self.status, self.reason, self.headers = resp.status, resp.reason, resp.headers
+        self.encoding = (resp.headers.get("Content-Encoding") or "").strip().lower()
+        if self.encoding in ("gzip", "x-gzip"):
+            self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "deflate":
+            self._z = zlib.decompressobj()
+        else:
+            self._z = None
+        self.wire_bytes, self._buf, self._done = 0, b"", False
+
+    def _decompress(self, chunk):
+        try:
+            return self._z.decompress(chunk)
+        except zlib.error:
+            # deflate를 zlib 헤더 없이(raw) 보내는 서버 대응
+            if self.encoding != "deflate" or self.wire_bytes != len(chunk):
+                raise
+            self._z = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._z.decompress(chunk)
+
+    def read(self, n=-1):
+        while not self._done and (n < 0 or len(self._buf) < n):
+            chunk = self.resp.read(STREAM_CHUNK if n < 0 else max(n, STREAM_CHUNK))
+            if not chunk:
+                if self._z:
+                    self._buf += self._z.flush()
+                self._done = True
+                self._release()
+                break
+            self.wire_bytes += len(chunk)
+            self._buf += self._decompress(chunk) if self._z else chunk
+        if n < 0:
+            out, self._buf = self._buf, b""
+        else:
+            out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+    def _release(self):
+        if self.conn is None:
+            return
+        if self.resp.will_close:
+            self.conn.close()
+        else:
+            self.client.release(self.key, self.conn)
+        self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpClient:
+    """호스트별 keep-alive 연결 풀 HTTP/1.1 클라이언트 (스레드 안전)
+
+    - 유휴 연결을 재사용해 페이지마다 TCP/TLS 핸드셰이크를 반복하지 않는다
+    - Accept-Encoding: gzip, deflate 협상 (해제는 HttpResponse.read에서 스트리밍)
+    - 연결 타임아웃과 읽기 타임아웃 분리
+    - 429/503의 Retry-After는 호스트 단위로 기억해 다음 요청을 그때까지 늦춘다
+    - 환경 변수 프록시(HTTPS_PROXY 등)는 CONNECT 터널 / 절대 URL로 처리
+    """
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 pool_size=HTTP_POOL_SIZE):
+        self.connect_timeout, self.read_timeout, self.pool_size = connect_timeout, read_timeout, pool_size
+        self.idle = {}
+        self.not_before = {}
+        self.lock = threading.Lock()
+
+    def _proxy(self, scheme, host):
+        proxy = getproxies().get(scheme)
+        return None if not proxy or proxy_bypass(host) else urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+    def _connect(self, key):
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = self._proxy(scheme, host)
+        if proxy and scheme == "https":
+            conn = cls(proxy.hostname, proxy.port or 8080, timeout=self.connect_timeout)
+            conn.set_tunnel(host, port)
+        elif proxy:
+            conn = cls(proxy.hostname, proxy.port or 8080, timeout=self.connect_timeout)
+        else:
+            conn = cls(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        conn.proxied = bool(proxy) and scheme == "http"
+        METRICS.connection()
+        return conn
+
+    def _acquire(self, key):
+        with self.lock:
+            pool = self.idle.get(key)
+            if pool:
+                return pool.pop(), True
+        return self._connect(key), False
+
+    def release(self, key, conn):
+        with self.lock:
+            pool = self.idle.setdefault(key, [])
+            if len(pool) < self.pool_size:
+                pool.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            pools, self.idle = self.idle, {}
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+    def _wait(self, host):
+        with self.lock:
+            delay = self.not_before.get(host, 0) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _retry_after(self, host, value):
+        """Retry-After (초 또는 HTTP 날짜) → 해당 호스트 요청을 그때까지 보류"""
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - datetime.now(tz=timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return
+        delay = min(RETRY_AFTER_MAX, max(0.0, delay))
+        with self.lock:
+            self.not_before[host] = max(self.not_before.get(host, 0), time.monotonic() + delay)
+
+    def _send(self, key, url, headers):
+        """유휴 연결이 서버 쪽에서 이미 끊겼으면 새 연결로 한 번 더 보냄"""
+        path = urlsplit(url)._replace(scheme="", netloc="").geturl() or "/"
+        conn, reused = self._acquire(key)
+        while True:
+            try:
+                conn.request("GET", url if conn.proxied else path, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            conn, reused = self._connect(key), False
+
+    def get(self, url, headers=None):
+        """GET → HttpResponse (상태 코드와 무관하게 반환, 3xx Location은 따라감)"""
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            self._wait(key[1])
+            hdrs = {"Accept-Encoding": "gzip, deflate", "Host": parts.netloc, **(headers or {})}
+            conn, raw = self._send(key, url, hdrs)
+            resp = HttpResponse(self, key, conn, raw)
+            if resp.status in (429, 503) and resp.headers.get("Retry-After"):
+                self._retry_after(key[1], resp.headers["Retry-After"])
+            location = resp.headers.get("Location")
+            if resp.status in (301, 302, 303, 307, 308) and location:
+                resp.read()
+                url = urljoin(url, location)
+                continue
+            return resp
+        raise http.client.HTTPException(f"리다이렉트 {HTTP_MAX_REDIRECTS}회 초과: {url}")
+
+
+HTTP = HttpClient()
+
+
+def fetch_cached(url, label=""):
+    """조건부 GET → 캐시 메타데이터 반환 (본문은 meta["body_path"]). 304면 다운로드 생략"""
+    cached = HTTP_CACHE.lookup(url)
+    if HTTP_CACHE.offline:
+        METRICS.request(label, url, "offline" if cached else "miss", 0, 0)
+        if not cached:
+            print(f"    ❌ {label}: 오프라인 캐시 없음")
+            return None
+        cached["status"] = "offline"
+        return cached
+    headers = dict(HEADERS)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    start = time.perf_counter()
+    try:
+        with HTTP.get(url, headers) as resp:
+            if resp.status == 304 and cached:
+                resp.read()
+                METRICS.request(label, url, 304, resp.wire_bytes, time.perf_counter() - start)
+                HTTP_CACHE.touch(url)
+                cached["status"] = 304
+                return cached
+            if not 200 <= resp.status < 300:
+                resp.read()
+                err = f"HTTP {resp.status} {resp.reason}"
+                METRICS.request(label, url, resp.status, resp.wire_bytes, time.perf_counter() - start, err)
+                print(f"    ❌ {label}: {err}")
+                return None
+            meta = HTTP_CACHE.store(url, resp, resp.headers)
+            meta["status"] = resp.status
+            METRICS.request(label, url, resp.status, resp.wire_bytes, time.perf_counter() - start)
+            return meta
+    except Exception as e:
+        METRICS.request(label, url, None, 0, time.perf_counter() - start, str(e))
+        print(f"    ❌ {label}: {e}")
+        return None
+
+
+def read_body(meta):
+    with open(meta["body_path"], "rb") as f:
+        return f.read()
+
+
+def iter_json_array(fp, chunk_size=STREAM_CHUNK):
+    """바이너리 스트림(소켓/파일)의 최상위 JSON 배열 원소를 하나씩 yield
+
+    청크 단위로 읽어 JSONDecoder.raw_decode로 원소를 잘라내므로
+    메모리에는 현재 원소 + 청크 하나만 유지된다.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_ws()
+    if buf[pos:pos + 1] == "\ufeff":
+        pos += 1
+        skip_ws()
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("JSON 배열이 아님")
+    pos += 1
+    first = True
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("JSON 배열이 닫히지 않음")
+        if buf[pos] == "]":
+            return
+        if not first:
+            if buf[pos] != ",":
+                raise ValueError(f"',' 필요 (위치 {pos})")
+            pos += 1
+            skip_ws()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # 숫자가 청크 경계에서 잘렸을 수 있음 (예: "1.5" 중 "1"만 읽힘)
+            if not eof and (end == len(buf) or buf[end] in ".eE+-0123456789"):
+                fill()
+                continue
+            break
+        pos = end
+        first = False
+        yield obj
 
 
 def fetch_url(url, label=""):
-    """URL fetch with browser-like headers"""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/html, */*",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
+    """URL fetch with browser-like headers (조건부 GET 디스크 캐시 경유)"""
+    meta = fetch_cached(url, label)
+    if meta is None:
+        return None
     try:
-        req = Request(url, headers=headers)
-        with urlopen(req, timeout=60) as resp:
-            return json.loads(resp.read().decode("utf-8"))
+        return json.loads(read_body(meta))
     except Exception as e:
         print(f"    ❌ {label}: {e}")
         return None
 
 
-def get_sector(ticker):
-    return SECTOR_MAP.get(str(ticker).upper().strip(), "기타") if ticker and ticker != "--" else "기타"
+class TokenBucket:
+    """스레드 안전 토큰 버킷 rate limiter (초당 rate회, 최대 burst회 연속)"""
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
 
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
-def get_party(name):
-    for surname, p in PARTY_MAP.items():
-        if surname in str(name):
-            return p
+
+def fetch_with_retry(url, label="", retries=FETCH_RETRIES, backoff=1.0, limiter=None):
+    """fetch_url + 지터 지수 백오프 재시도 (오프라인 캐시 미스는 재시도해도 소용없으므로 바로 None)"""
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        data = fetch_url(url, label)
+        if data is not None or HTTP_CACHE.offline:
+            return data
+        if attempt < retries:
+            METRICS.retry(label)
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
     return None
 
 
+def trade_id(prefix, *fields):
+    """소스 접두어 + 원본 필드 해시 → 안정적인 거래 식별자"""
+    raw = "|".join(str(f).strip().lower() for f in fields)
+    return f"{prefix}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]}"
+
+
+def uniquify_ids(trades, seen=None):
+    """같은 식별자가 반복되면 (동일일 동일 거래 여러 건) #2, #3 … 접미어 부여
+
+    배치를 나눠 처리할 때는 같은 seen dict를 넘겨 배치 간에도 번호가 이어지게 한다.
+    """
+    seen = {} if seen is None else seen
+    for t in trades:
+        n = seen.get(t["id"], 0) + 1
+        seen[t["id"]] = n
+        if n > 1:
+            t["id"] = f"{t['id']}#{n}"
+    return trades
+
+
+# ═══════════════════════════════════════════════
+# TICKER REFERENCE
+# ═══════════════════════════════════════════════
+# reference/*.csv (ticker, name, sector, sic, aliases) → .state/tickers.bin, 첫 조회 때 mmap
+# sector가 비어 있으면 SIC 코드로 분류 (EDGAR 등 외부 목록을 그대로 추가할 수 있게)
+# .bin 레이아웃 (little-endian)
+#   헤더 24B : magic "CTTK", version u16, 섹터 수 u16, 종목 수 u32, 티커 키 수 u32, 이름 키 수 u32, 예약 u32
+#   sectors  : (문자열 offset u32, 길이 u16) × 섹터 수
+#   companies: (티커 10B, 섹터 u16, 이름 offset u32, 길이 u16) × 종목 수
+#   keys     : (티커 키 10B, 종목 번호 u32) × 키 수      — 티커 키 오름차순 (별칭 포함)
+#   names    : (이름 키 offset u32, 길이 u16, 종목 번호 u32) × 이름 키 수 — 이름 키 바이트 오름차순
+#   blob     : UTF-8 문자열
+TICKER_MAGIC = b"CTTK"
+TICKER_HEADER = struct.Struct("<4sHHIIII")
+TICKER_SECTOR = struct.Struct("<IH")
+TICKER_COMPANY = struct.Struct("<10sHIH")
+TICKER_KEY = struct.Struct("<10sI")
+TICKER_NAME = struct.Struct("<IHI")
+TICKER_KEY_LEN = 10
+TICKER_EXCHANGES = {"NYSE", "NASDAQ", "NYSEARCA", "NYSEAMERICAN", "AMEX", "ARCA", "BATS", "OTC", "OTCMKTS"}
+# 발행사 이름 비교 시 버리는 토큰 (법인 형태, 주식 종류 표기)
+ISSUER_NOISE = {"the", "and", "inc", "incorporated", "corp", "corporation", "co", "company", "companies",
+                "ltd", "limited", "plc", "llc", "lp", "sa", "nv", "ag", "se", "group", "holding", "holdings",
+                "class", "cl", "common", "stock", "shares", "share", "ordinary", "adr", "ads", "sponsored",
+                "new", "com", "cmn", "registered"}
+# SIC 코드 범위 → 섹터 (좁은 범위가 먼저, 첫 일치 사용)
+SIC_SECTORS = [
+    (3674, 3674, "반도체"),
+    (3480, 3489, "방산"), (3720, 3729, "방산"), (3760, 3769, "방산"), (3795, 3795, "방산"), (3812, 3812, "방산"),
+    (3711, 3711, "소비재"),
+    (3570, 3579, "테크"), (3660, 3679, "테크"),
+    (7370, 7379, "소프트웨어"),
+    (2830, 2836, "헬스케어"), (3840, 3851, "헬스케어"), (5122, 5122, "헬스케어"), (8000, 8099, "헬스케어"),
+    (1200, 1399, "에너지"), (2900, 2999, "에너지"), (4610, 4619, "에너지"), (4920, 4923, "에너지"),
+    (1000, 1099, "광업"), (1400, 1499, "광업"),
+    (4810, 4829, "통신"), (4830, 4899, "미디어"), (2710, 2799, "미디어"), (7810, 7829, "미디어"),
+    (4900, 4999, "유틸리티"),
+    (6500, 6553, "부동산"), (6798, 6798, "부동산"),
+    (6000, 6799, "금융"),
+    (4000, 4799, "운송"),
+    (2000, 2199, "필수소비재"), (5140, 5149, "필수소비재"), (5400, 5499, "필수소비재"),
+    (2600, 2699, "소재"), (2800, 2899, "소재"), (3200, 3399, "소재"),
+    (2200, 2399, "소비재"), (3100, 3199, "소비재"), (5200, 5999, "소비재"), (7000, 7099, "소비재"),
+    (1500, 1799, "산업재"), (3400, 3799, "산업재"), (3800, 3899, "산업재"), (4950, 4959, "산업재"),
+]
+TickerInfo = namedtuple("TickerInfo", "ticker name sector")
+
+
+def ticker_key(raw):
+    """티커 표기 정규화: 대문자, 거래소 접두/접미 제거, 클래스 구분자(. - / 공백) → '.'"""
+    t = str(raw or "").strip().upper()
+    if ":" in t:
+        head, _, tail = t.partition(":")
+        t = tail if head in TICKER_EXCHANGES else head
+    t = ".".join(p for p in t.replace("/", ".").replace("-", ".").replace(" ", ".").split(".") if p)
+    return t if t and t != "--" else ""
+
+
+def issuer_key(raw):
+    """발행사/자산 이름 정규화: 악센트·구두점 제거, 소문자, 법인 형태·주식 종류·한 글자 토큰 제거"""
+    s = unicodedata.normalize("NFKD", str(raw or "")).encode("ascii", "ignore").decode().lower()
+    s = "".join(c if c.isalnum() else " " for c in s)
+    return " ".join(w for w in s.split() if len(w) > 1 and w not in ISSUER_NOISE)
+
+
+def sic_sector(sic):
+    try:
+        code = int(str(sic).strip())
+    except (TypeError, ValueError):
+        return ""
+    for lo, hi, sector in SIC_SECTORS:
+        if lo <= code <= hi:
+            return sector
+    return ""
+
+
+def read_ticker_csvs(csv_dir=REFERENCE_DIR):
+    """reference/*.csv 행 → (ticker, name, sector, aliases) (파일명 순, 먼저 나온 티커 우선)"""
+    out, taken = [], set()
+    for name in sorted(os.listdir(csv_dir)) if os.path.isdir(csv_dir) else []:
+        if not name.lower().endswith(".csv"):
+            continue
+        with open(os.path.join(csv_dir, name), newline="", encoding="utf-8-sig") as f:
+            for r in csv.DictReader(f):
+                r = {(k or "").strip().lower(): (v or "").strip() for k, v in r.items()}
+                tk = ticker_key(r.get("ticker"))
+                sector = r.get("sector") or sic_sector(r.get("sic"))
+                if not tk or len(tk) > TICKER_KEY_LEN or not sector or tk in taken:
+                    continue
+                taken.add(tk)
+                aliases = [ticker_key(a) for a in r.get("aliases", "").replace(";", " ").replace("|", " ").split()]
+                out.append((tk, r.get("name", ""), sector, [a for a in aliases if a and len(a) <= TICKER_KEY_LEN]))
+    return out
+
+
+def write_ticker_index(path, rows):
+    """(ticker, name, sector, aliases) 목록 → tickers.bin, 종목 수 반환
+
+    키 충돌은 먼저 나온 종목이 가진다 (티커 > 별칭 순, 이름 키는 행 순서).
+    """
+    blob = bytearray()
+
+    def put(s):
+        b = s.encode("utf-8")
+        blob.extend(b)
+        return len(blob) - len(b), len(b)
+
+    sectors = sorted({r[2] for r in rows})
+    sector_id = {s: i for i, s in enumerate(sectors)}
+    sector_tab = b"".join(TICKER_SECTOR.pack(*put(s)) for s in sectors)
+    companies, keys, names = [], {tk: i for i, (tk, *_) in enumerate(rows)}, {}
+    for i, (tk, name, sector, aliases) in enumerate(rows):
+        off, n = put(name[:200])
+        companies.append(TICKER_COMPANY.pack(tk.encode("ascii", "ignore"), sector_id[sector], off, n))
+        for a in aliases:
+            keys.setdefault(a, i)
+        nk = issuer_key(name)
+        if nk:
+            names.setdefault(nk.encode("ascii"), i)
+    key_tab = b"".join(TICKER_KEY.pack(k.encode("ascii", "ignore"), i) for k, i in sorted(keys.items()))
+    name_tab = b"".join(TICKER_NAME.pack(*put(k.decode()), i) for k, i in sorted(names.items()))
+    header = TICKER_HEADER.pack(TICKER_MAGIC, 1, len(sectors), len(rows), len(keys), len(names), 0)
+    _atomic_write(path, header + sector_tab + b"".join(companies) + key_tab + name_tab + bytes(blob))
+    return len(rows)
+
+
+def ingest_tickers(csv_dir=REFERENCE_DIR, path=TICKER_INDEX_PATH):
+    """CSV가 .bin보다 새로우면 다시 컴파일, 컴파일한 종목 수 반환 (최신이면 0)"""
+    if not os.path.isdir(csv_dir):
+        return 0
+    srcs = [os.path.join(csv_dir, n) for n in os.listdir(csv_dir) if n.lower().endswith(".csv")]
+    if not srcs or os.path.exists(path) and os.path.getmtime(path) >= max(map(os.path.getmtime, srcs)):
+        return 0
+    return write_ticker_index(path, read_ticker_csvs(csv_dir))
+
+
+class _MappedKeys:
+    """mmap 위 정렬된 고정폭 레코드의 키 열 (bisect용 시퀀스, 키마다 bytes 한 개만 만든다)"""
+    def __init__(self, key_at, n):
+        self.key_at, self.n = key_at, n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return self.key_at(i)
+
+
+class TickerIndex:
+    """tickers.bin 조회기: 처음 조회할 때 (CSV가 더 새로우면 다시 컴파일 후) mmap
+
+    티커/별칭/이름 조회는 mmap 위 이진 탐색이고, get_sector의 lru_cache가 같은 티커 반복을 O(1)로 만든다.
+    프로세스 풀 워커도 각자 lazily 열어 OS 페이지 캐시를 공유한다.
+    """
+    def __init__(self, path=TICKER_INDEX_PATH, csv_dir=REFERENCE_DIR):
+        self.path, self.csv_dir = path, csv_dir
+        self.mm = None      # None = 아직 안 엶, False = 참조 데이터 없음
+        self.version, self.count = "none", 0
+        self.lock = threading.Lock()
+
+    def _open(self):
+        with self.lock:
+            if self.mm is None:
+                self.mm = False
+                try:
+                    ingest_tickers(self.csv_dir, self.path)
+                except (OSError, ValueError) as e:
+                    print(f"    ❌ 티커 참조 컴파일: {e}")
+                try:
+                    self._map()
+                except (OSError, ValueError, struct.error):
+                    self.mm = False
+        return self.mm
+
+    def revision(self):
+        """참조 데이터 해시 앞 12자리 (정규화 캐시 키에 넣어 참조가 바뀌면 재분류)"""
+        self._open()
+        return self.version
+
+    def _map(self):
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_sec, n_comp, n_keys, n_names, _ = TICKER_HEADER.unpack_from(mm, 0)
+        if magic != TICKER_MAGIC or version != 1:
+            mm.close()
+            raise ValueError(f"{self.path}: 티커 참조 형식 아님")
+        self.mm = mm
+        self.comps_at = TICKER_HEADER.size + n_sec * TICKER_SECTOR.size
+        self.keys_at = self.comps_at + n_comp * TICKER_COMPANY.size
+        self.names_at = self.keys_at + n_keys * TICKER_KEY.size
+        self.blob_at = self.names_at + n_names * TICKER_NAME.size
+        self.sectors = [self._str(*TICKER_SECTOR.unpack_from(mm, TICKER_HEADER.size + i * TICKER_SECTOR.size))
+                        for i in range(n_sec)]
+        self.keys = _MappedKeys(self._ticker_key, n_keys)
+        self.names = _MappedKeys(self._name_key, n_names)
+        self.version = hashlib.sha256(mm).hexdigest()[:12]
+        self.count = n_comp
+
+    def _str(self, off, n):
+        return self.mm[self.blob_at + off:self.blob_at + off + n].decode("utf-8")
+
+    def _ticker_key(self, i):
+        at = self.keys_at + i * TICKER_KEY.size
+        return self.mm[at:at + TICKER_KEY_LEN]
+
+    def _name_key(self, i):
+        off, n, _ = TICKER_NAME.unpack_from(self.mm, self.names_at + i * TICKER_NAME.size)
+        return self.mm[self.blob_at + off:self.blob_at + off + n]
+
+    def _company(self, i):
+        tk, sector, off, n = TICKER_COMPANY.unpack_from(self.mm, self.comps_at + i * TICKER_COMPANY.size)
+        return TickerInfo(tk.rstrip(b"\0").decode("ascii"), self._str(off, n), self.sectors[sector])
+
+    def _find_ticker(self, key):
+        k = key.encode("ascii", "ignore").ljust(TICKER_KEY_LEN, b"\0")
+        i = bisect.bisect_left(self.keys, k)
+        if i < len(self.keys) and self.keys[i] == k:
+            return self._company(TICKER_KEY.unpack_from(self.mm, self.keys_at + i * TICKER_KEY.size)[1])
+        return None
+
+    def lookup(self, ticker):
+        """티커/별칭 → TickerInfo (BRK-B, BRK/B, BRK.B 동일, 모르는 클래스는 기본 티커로 재시도)"""
+        key = ticker_key(ticker)
+        if not key or len(key) > TICKER_KEY_LEN or not self._open():
+            return None
+        hit = self._find_ticker(key)
+        if hit is None and "." in key:
+            hit = self._find_ticker(key.split(".")[0])
+        return hit
+
+    def by_name(self, issuer):
+        """발행사/자산 이름 → TickerInfo (정확히 같은 이름 키, 없으면 뒤 단어를 줄여 가며 재시도)"""
+        words = issuer_key(issuer).split()
+        if not words or not self._open():
+            return None
+        for n in range(len(words), 0, -1):
+            k = " ".join(words[:n]).encode("ascii")
+            if n == 1 and len(k) < 4:
+                break
+            i = bisect.bisect_left(self.names, k)
+            if i < len(self.names) and self.names[i] == k:
+                return self._company(TICKER_NAME.unpack_from(self.mm, self.names_at + i * TICKER_NAME.size)[2])
+        return None
+
+
+TICKERS = TickerIndex()
+
+
+@lru_cache(maxsize=8192)  # 서버처럼 오래 도는 프로세스에서도 (티커, 발행사명) 키가 무한히 쌓이지 않게 상한
+def get_sector(ticker, issuer=None):
+    """섹터 분류: SECTOR_MAP → 티커 참조(별칭/클래스) → 발행사 이름 → '기타'"""
+    tk = str(ticker or "").upper().strip()
+    if tk in SECTOR_MAP:
+        return SECTOR_MAP[tk]
+    hit = TICKERS.lookup(tk) or (TICKERS.by_name(issuer) if issuer else None)
+    if hit is None:
+        return "기타"
+    return SECTOR_MAP.get(hit.ticker, hit.sector)
+
+
+# ═══════════════════════════════════════════════
+# POLITICIAN RESOLVER
+# ═══════════════════════════════════════════════
+Politician = namedtuple("Politician", "name party sectors")
+
+NAME_NOISE = {"hon", "honorable", "mr", "mrs", "ms", "dr", "sen", "senator", "rep",
+              "representative", "jr", "sr", "ii", "iii", "iv"}
+
+
+def normalize_name(raw):
+    """이름 → 토큰 튜플 (소문자, 악센트/구두점/경칭/접미사/중간 이니셜 제거)"""
+    s = unicodedata.normalize("NFKD", str(raw or "")).encode("ascii", "ignore").decode("ascii").lower()
+    s = "".join(c if c.isalnum() else " " for c in s)
+    tokens = [t for t in s.split() if t not in NAME_NOISE]
+    if len(tokens) > 2:
+        tokens = [tokens[0]] + [t for t in tokens[1:-1] if len(t) > 1] + [tokens[-1]]
+    return tuple(tokens)
+
+
+class PoliticianResolver:
+    """시작 시 한 번 만든 이름/성 해시 인덱스로 정치인 식별 (원본 이름별 LRU 메모)
+
+    조회 순서: 전체 이름 → 이름+성 → 성(1~2토큰, 이름 첫 글자 일치 또는 성만 있을 때) →
+    성만 있는 정당 매핑(EXTRA_PARTY). 부분 문자열이 아닌 토큰 단위로 비교하므로
+    "Green"이 "Greene"에, "Rick Scott"이 다른 Scott에 매칭되지 않는다.
+    """
+    def __init__(self, info, extra_party=None, aliases=None):
+        self.full, self.first_last, self.surname, self.party_only = {}, {}, {}, {}
+        for name, meta in info.items():
+            rec = Politician(name, meta.get("party") or None, tuple(meta.get("sectors", [])))
+            tokens = normalize_name(name)
+            self.full[tokens] = rec
+            self.first_last[(tokens[0], tokens[-1])] = rec
+            for k in (tokens[-1:], tokens[-2:]):
+                self.surname.setdefault(k, []).append(rec)
+        for alias, name in (aliases or {}).items():
+            if name in info:
+                self.full[normalize_name(alias)] = self.full[normalize_name(name)]
+        for surname, party in (extra_party or {}).items():
+            self.party_only[normalize_name(surname)] = Politician(None, party, ())
+        self.resolve = lru_cache(maxsize=8192)(self._resolve)
+
+    def _resolve(self, raw):
+        tokens = normalize_name(raw)
+        if not tokens:
+            return None
+        rec = self.full.get(tokens) or (self.first_last.get((tokens[0], tokens[-1])) if len(tokens) > 1 else None)
+        if rec:
+            return rec
+        for k in (tokens[-2:], tokens[-1:]):
+            # 토큰 전체가 성이면 ("Wasserman Schultz") 이름 첫 글자 비교 생략
+            cands = [r for r in self.surname.get(k, ()) if k == tokens or r.name[0].lower() == tokens[0][0]]
+            if len(cands) == 1:
+                return cands[0]
+        for k in (tokens[-2:], tokens[-1:]):
+            if k in self.party_only:
+                return self.party_only[k]
+        return None
+
+
+RESOLVER = PoliticianResolver(POLITICIAN_INFO, EXTRA_PARTY, POLITICIAN_ALIASES)
+
+
+def resolve_politician(name):
+    return RESOLVER.resolve(str(name or ""))
+
+
+def canonical_rep(name):
+    """정식 이름을 알면 정식 이름, 아니면 원본 이름"""
+    pol = resolve_politician(name)
+    return pol.name if pol and pol.name else name
+
+
+def get_party(name):
+    pol = resolve_politician(name)
+    return pol.party if pol else None
+
+
 def check_conflict(name, sector):
     if not sector or sector == "기타":
         return False
-    for pname, info in POLITICIAN_INFO.items():
-        if any(part in str(name) for part in pname.split() if len(part) > 3):
-            return sector in info.get("sectors", [])
-    return False
+    pol = resolve_politician(name)
+    return bool(pol) and sector in pol.sectors
 
 
 def get_amount_mid(amount_str):
@@ -200,102 +1277,302 @@ def get_amount_mid(amount_str):
 # ═══════════════════════════════════════════════
 # SOURCE 1: Capitol Trades API (공개, 키 불필요)
 # ═══════════════════════════════════════════════
-def fetch_capitol_trades():
-    """capitoltrades.com 공개 API에서 데이터 수집"""
-    print("  📡 소스1: Capitol Trades API...")
-    trades = []
-    # Capitol Trades는 페이지 기반 API
-    for page in range(1, 6):  # 최대 5페이지
-        url = f"https://bff.capitoltrades.com/trades?page={page}&pageSize=96&txType=stock"
-        data = fetch_url(url, f"Capitol Trades p{page}")
-        if not data:
-            break
-        items = data.get("data", [])
-        if not items:
-            break
-        for item in items:
-            pol = item.get("politician", {})
-            issuer = item.get("issuer", {})
-            name = f"{pol.get('firstName','')} {pol.get('lastName','')}".strip()
-            ticker = issuer.get("ticker", "")
-            tx_type = item.get("txType", "").lower()
-            if not name or not ticker:
-                continue
-            is_buy = "buy" in tx_type or "purchase" in tx_type
-            is_sell = "sell" in tx_type or "sale" in tx_type
-            if not is_buy and not is_sell:
-                continue
-            party_raw = pol.get("party", "")
-            party = "D" if "democrat" in party_raw.lower() else "R" if "republican" in party_raw.lower() else get_party(name)
-            chamber = pol.get("chamber", "house").lower()
-            sector = get_sector(ticker)
-            conflict = check_conflict(name, sector)
-            size = item.get("txAmount", 0) or 0
-            trade = {
-                "rep": name, "party": party, "ticker": ticker.upper(),
-                "asset": issuer.get("name", ticker)[:60],
-                "type": "buy" if is_buy else "sell",
-                "amount": item.get("txAmountRangeText", ""),
-                "amount_mid": size if size else get_amount_mid(item.get("txAmountRangeText", "")),
-                "date": item.get("txDate", ""),
-                "disclosure_date": item.get("filingDate", ""),
-                "sector": sector, "conflict": conflict,
-                "chamber": chamber, "owner": item.get("owner", ""),
-            }
-            trades.append(trade)
-        print(f"    ✅ 페이지 {page}: {len(items)}건")
-        time.sleep(0.5)
-    return trades
+def ct_page_url(page):
+    return f"{CT_API_URL}?page={page}&pageSize={CT_PAGE_SIZE}&txType=stock"
+
+
+def capitol_item_id(item):
+    """원본 레코드만으로 계산하는 거래 id (정규화 없이 stop-on-seen 판단에 사용)"""
+    tx_id = item.get("_txId")
+    if tx_id:
+        return f"ct:{tx_id}"
+    pol = item.get("politician", {})
+    name = f"{pol.get('firstName','')} {pol.get('lastName','')}".strip()
+    return trade_id("ct", name, item.get("issuer", {}).get("ticker", ""), item.get("txDate", ""),
+                    item.get("txType", "").lower(), item.get("txAmountRangeText", ""), item.get("owner", ""))
+
+
+def normalize_capitol_item(item):
+    """Capitol Trades 원본 레코드 → trade dict (매수/매도 아니면 None)"""
+    pol = item.get("politician", {})
+    issuer = item.get("issuer", {})
+    name = f"{pol.get('firstName','')} {pol.get('lastName','')}".strip()
+    ticker = issuer.get("ticker", "")
+    tx_type = item.get("txType", "").lower()
+    if not name or not ticker:
+        return None
+    is_buy = "buy" in tx_type or "purchase" in tx_type
+    is_sell = "sell" in tx_type or "sale" in tx_type
+    if not is_buy and not is_sell:
+        return None
+    party_raw = pol.get("party", "")
+    party = "D" if "democrat" in party_raw.lower() else "R" if "republican" in party_raw.lower() else get_party(name)
+    chamber = pol.get("chamber", "house").lower()
+    sector = get_sector(ticker, issuer.get("name"))
+    conflict = check_conflict(name, sector)
+    size = item.get("txAmount", 0) or 0
+    return {
+        "id": capitol_item_id(item),
+        "source": "capitol_trades",
+        "rep": canonical_rep(name), "party": party, "ticker": ticker.upper(),
+        "asset": issuer.get("name", ticker)[:60],
+        "type": "buy" if is_buy else "sell",
+        "amount": item.get("txAmountRangeText", ""),
+        "amount_mid": size if size else get_amount_mid(item.get("txAmountRangeText", "")),
+        "date": item.get("txDate", ""),
+        "disclosure_date": item.get("filingDate", ""),
+        "sector": sector, "conflict": conflict,
+        "chamber": chamber, "owner": item.get("owner", ""),
+    }
+
+
+class CapitolTradesSource:
+    """capitoltrades.com 공개 API 수집 소스
+
+    1페이지 응답의 totalPages로 전체 페이지 수를 알아낸 뒤, 나머지 페이지는
+    스레드 풀로 concurrency개씩 병렬 수집한다 (토큰 버킷으로 초당 요청 수 제한).
+    제출 후 아직 내보내지 않은 페이지는 concurrency*2개까지만 두는 슬라이딩 윈도우라
+    중단(저장소 도달/실패 페이지/소비 측 종료) 시 남는 요청도 그만큼으로 제한된다.
+    실패한 페이지는 재시도하며, 한 페이지 실패가 이후 페이지를 막지 않는다.
+    max_pages=0 이면 전체 페이지를 수집한다.
+    seen(거래 id → bool)이 주어지면 저장소에 이미 있는 거래가 나온 시점에서 페이징을 멈춘다.
+    """
+    name, label = "capitol_trades", "Capitol Trades"
+    normalize = staticmethod(normalize_capitol_item)
+
+    def __init__(self, max_pages=CT_MAX_PAGES, concurrency=CT_CONCURRENCY, rate=CT_RATE, seen=None):
+        self.max_pages, self.concurrency, self.rate, self.seen = max_pages, concurrency, rate, seen
+
+    def _reached_seen(self, items):
+        return self.seen is not None and any(self.seen(capitol_item_id(i)) for i in items)
+
+    def _pages(self, start=1):
+        """(페이지 번호, 원본 레코드 목록 | 실패 시 None)을 페이지 순서대로 yield (첫 페이지 실패는 예외)"""
+        print("  📡 소스1: Capitol Trades API...")
+        concurrency = max(1, self.concurrency)
+        limiter = TokenBucket(self.rate, burst=concurrency)
+        first = fetch_with_retry(ct_page_url(start), f"Capitol Trades p{start}", limiter=limiter)
+        if first is None:
+            raise RuntimeError(f"Capitol Trades 페이지 {start} 실패")  # 빈 결과와 구분 (백필 체크포인트 유지)
+        if not first.get("data"):
+            return
+        paging = (first.get("meta") or {}).get("paging") or {}
+        total_pages = int(paging.get("totalPages") or 1)
+        if self.max_pages:
+            total_pages = min(total_pages, self.max_pages)
+        print(f"    ✅ 페이지 {start}: {len(first['data'])}건 (전체 {total_pages}페이지)")
+        yield start, first["data"]
+
+        next_page = start + 1
+        if self._reached_seen(first["data"]):
+            print("    ⏹️ 저장소에 있는 거래 도달 → 페이징 중단")
+            return
+        window = concurrency * 2
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        futures, done, emit, stop = {}, {}, next_page, False
+        try:
+            while futures or (not stop and next_page <= total_pages):
+                while not stop and next_page <= total_pages and next_page < emit + window:
+                    futures[pool.submit(fetch_with_retry, ct_page_url(next_page), f"Capitol Trades p{next_page}",
+                                        limiter=limiter)] = next_page
+                    next_page += 1
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    p = futures.pop(fut)
+                    data = fut.result()
+                    if data is None:
+                        print(f"    ⚠️ 페이지 {p}: 재시도 후 실패")
+                        done[p] = None
+                    else:
+                        done[p] = data.get("data") or []
+                        print(f"    ✅ 페이지 {p}: {len(done[p])}건")
+                        if not stop and (not done[p] or self._reached_seen(done[p])):
+                            print("    ⏹️ 저장소에 있는 거래 도달 → 페이징 중단")
+                            stop = True
+                # 완료된 페이지를 순서대로 바로 내보냄 (정규화와 겹치도록)
+                while emit in done:
+                    yield emit, done.pop(emit)
+                    emit += 1
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)  # 아직 시작 안 한 요청은 보내지 않음
+
+    def produce(self):
+        """(정규화 여부, 원본 레코드 배치)를 페이지 순서대로 yield"""
+        for _, items in self._pages():
+            if items:
+                yield False, items
+
+    def backfill_key(self):
+        return f"ps{CT_PAGE_SIZE}"
+
+    def raw_chunks(self, start=0):
+        """백필용 (청크 번호, 원본 레코드) — 청크 = 페이지, 실패 페이지에서 중단(재개 시 그 페이지부터)"""
+        for page, items in self._pages(start + 1):
+            if items is None:
+                raise RuntimeError(f"Capitol Trades 페이지 {page} 실패")
+            if not items:
+                return
+            yield page - 1, items
+
+    def select(self, trades):
+        return trades
+
+    def finish(self, trades, complete):
+        pass
+
+
+def fetch_capitol_trades(max_pages=CT_MAX_PAGES, concurrency=CT_CONCURRENCY, rate=CT_RATE, seen=None):
+    """capitoltrades.com 공개 API에서 데이터 수집 (단독 실행)"""
+    return collect(CapitolTradesSource(max_pages, concurrency, rate, seen))
 
 
 # ═══════════════════════════════════════════════
 # SOURCE 2: GitHub 오픈소스 상원 데이터
 # ═══════════════════════════════════════════════
+def us_to_iso_date(tx_date):
+    """MM/DD/YYYY → YYYY-MM-DD (그 외 형식은 그대로)"""
+    if "/" in tx_date:
+        try:
+            parts = tx_date.split("/")
+            tx_date = f"{parts[2]}-{parts[0].zfill(2)}-{parts[1].zfill(2)}"
+        except:
+            pass
+    return tx_date
+
+
+def normalize_senate_item(item, cutoff=""):
+    """GitHub 상원 원본 레코드 → trade dict (기준일 이전/티커 없음/매수·매도 외는 None)"""
+    tx_date = us_to_iso_date(item.get("transaction_date", ""))
+    if tx_date < cutoff:
+        return None
+    ticker = item.get("ticker", "")
+    if not ticker or ticker == "--":
+        return None
+    tx_type = item.get("type", "").lower()
+    is_buy = "purchase" in tx_type
+    is_sell = "sale" in tx_type
+    if not is_buy and not is_sell:
+        return None
+    name = f"{item.get('first_name','')} {item.get('last_name','')}".strip()
+    sector = get_sector(ticker, item.get("asset_description"))
+    conflict = check_conflict(name, sector)
+    return {
+        "id": trade_id("sn", name, ticker, tx_date, tx_type, item.get("amount", ""),
+                       item.get("owner", ""), item.get("asset_description", "")),
+        "source": "github_senate",
+        "rep": canonical_rep(name), "party": get_party(name), "ticker": ticker.upper(),
+        "asset": item.get("asset_description", ticker)[:60],
+        "type": "buy" if is_buy else "sell",
+        "amount": item.get("amount", ""),
+        "amount_mid": get_amount_mid(item.get("amount", "")),
+        "date": tx_date,
+        "disclosure_date": "",
+        "sector": sector, "conflict": conflict,
+        "chamber": "senate", "owner": item.get("owner", ""),
+    }
+
+
+def iter_senate_trades(items, cutoff=""):
+    """원소 단위 필터 + 정규화 제너레이터 (버려지는 레코드는 보관하지 않음)"""
+    for item in items:
+        if isinstance(item, dict):
+            trade = normalize_senate_item(item, cutoff)
+            if trade:
+                yield trade
+
+
+class GithubSenateSource:
+    """timothycarambat GitHub 레포 상원 aggregate 수집 소스
+
+    본문은 디스크로 스트리밍 후 원소 단위로 파싱해 배치로 내보낸다.
+    정규화 캐시는 본문 해시로 찾고, 기록할 때의 기준일(watermark) 이후 거래만 한 줄씩 담는다.
+    매일 기준일이 앞으로 움직여도 watermark ≤ 기준일이면 적중이라, 한 줄씩 읽으며
+    기준일만 다시 걸러 내보낸다 (파싱/정규화 생략, 메모리는 배치 크기만큼).
+    """
+    name, label = "github_senate", "GitHub 상원"
+
+    def __init__(self, days=365):
+        self.cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d") if days else ""
+        self.cache_out = self.meta = None
+
+    def normalize(self, item):
+        return normalize_senate_item(item, self.cutoff) if isinstance(item, dict) else None
+
+    def select(self, trades):
+        """id 번호 부여가 끝난 배치 → 정규화 캐시에 덧붙이고 그대로 반환"""
+        if self.cache_out:
+            self.cache_out.write(trades)
+        return trades
+
+    def produce(self):
+        print("  📡 소스2: GitHub 상원 데이터...")
+        meta = fetch_cached(SENATE_URL, "GitHub Senate")
+        if meta is None:
+            return
+        norm_key = f"senate-v{NORMALIZE_VERSION}-{TICKERS.revision()}-{meta['sha256']}"
+        cached = HTTP_CACHE.open_normalized(norm_key)
+        if cached is not None:
+            header, f = cached
+            with f:
+                # watermark가 기준일보다 늦으면 (기간을 늘린 실행) 필요한 과거가 없음 → 다시 정규화
+                if header.get("watermark", "\uffff") <= self.cutoff:
+                    batch, n = [], 0
+                    for line in f:
+                        t = json.loads(line)
+                        if t["date"] >= self.cutoff:
+                            batch.append(t)
+                            if len(batch) >= PIPELINE_BATCH:
+                                n += len(batch)
+                                yield True, batch
+                                batch = []
+                    if batch:
+                        n += len(batch)
+                        yield True, batch
+                    print(f"    ✅ 캐시 적중 ({meta['status']}): 상원 {n}건")
+                    return
+        self.cache_out = HTTP_CACHE.normalized_writer(norm_key, {"watermark": self.cutoff})
+        with open(meta["body_path"], "rb") as f:
+            batch = []
+            for item in iter_json_array(f):
+                batch.append(item)
+                if len(batch) >= PIPELINE_BATCH:
+                    yield False, batch
+                    batch = []
+            if batch:
+                yield False, batch
+
+    def backfill_key(self):
+        """본문이 바뀌면 이전 체크포인트는 무효"""
+        self.meta = fetch_cached(SENATE_URL, "GitHub Senate")
+        if self.meta is None:
+            raise RuntimeError("GitHub 상원 데이터 다운로드 실패")
+        return f"{self.meta['sha256']}-{self.cutoff}"
+
+    def raw_chunks(self, start=0):
+        """백필용 (청크 번호, 원본 레코드 BACKFILL_CHUNK개) — start 이전 청크는 파싱만 하고 건너뜀"""
+        with open(self.meta["body_path"], "rb") as f:
+            batch, n = [], 0
+            for item in iter_json_array(f):
+                batch.append(item)
+                if len(batch) >= BACKFILL_CHUNK:
+                    if n >= start:
+                        yield n, batch
+                    batch, n = [], n + 1
+            if batch and n >= start:
+                yield n, batch
+
+    def finish(self, trades, complete):
+        if self.cache_out:
+            if complete:
+                self.cache_out.commit()
+            else:
+                self.cache_out.discard()
+            self.cache_out = None
+
+
 def fetch_github_senate():
-    """timothycarambat GitHub 레포에서 상원 데이터"""
-    print("  📡 소스2: GitHub 상원 데이터...")
-    url = "https://raw.githubusercontent.com/timothycarambat/senate-stock-watcher-data/master/aggregate/all_transactions.json"
-    data = fetch_url(url, "GitHub Senate")
-    if not data or not isinstance(data, list):
-        return []
-    trades = []
-    one_year_ago = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
-    for item in data:
-        tx_date = item.get("transaction_date", "")
-        # MM/DD/YYYY → YYYY-MM-DD
-        if "/" in tx_date:
-            try:
-                parts = tx_date.split("/")
-                tx_date = f"{parts[2]}-{parts[0].zfill(2)}-{parts[1].zfill(2)}"
-            except:
-                pass
-        if tx_date < one_year_ago:
-            continue
-        ticker = item.get("ticker", "")
-        if not ticker or ticker == "--":
-            continue
-        tx_type = item.get("type", "").lower()
-        is_buy = "purchase" in tx_type
-        is_sell = "sale" in tx_type
-        if not is_buy and not is_sell:
-            continue
-        name = f"{item.get('first_name','')} {item.get('last_name','')}".strip()
-        sector = get_sector(ticker)
-        conflict = check_conflict(name, sector)
-        trade = {
-            "rep": name, "party": get_party(name), "ticker": ticker.upper(),
-            "asset": item.get("asset_description", ticker)[:60],
-            "type": "buy" if is_buy else "sell",
-            "amount": item.get("amount", ""),
-            "amount_mid": get_amount_mid(item.get("amount", "")),
-            "date": tx_date,
-            "disclosure_date": "",
-            "sector": sector, "conflict": conflict,
-            "chamber": "senate", "owner": item.get("owner", ""),
-        }
-        trades.append(trade)
-    print(f"    ✅ 최근 1년 상원: {len(trades)}건")
-    return trades
+    """timothycarambat GitHub 레포에서 상원 데이터 (단독 실행)"""
+    return collect(GithubSenateSource())
 
 
 # ═══════════════════════════════════════════════
@@ -364,9 +1641,10 @@ def get_fallback_data():
         tx_date = (today - timedelta(days=days_ago)).strftime("%Y-%m-%d")
         disc_days = random.randint(15, 45)
         disc_date = (today - timedelta(days=days_ago - disc_days)).strftime("%Y-%m-%d")
-        sector = get_sector(ticker)
+        sector = get_sector(ticker, asset)
         conflict = check_conflict(name, sector)
         trades.append({
+            "id": f"fb:{i}", "source": "fallback",
             "rep": name, "party": party, "ticker": ticker, "asset": asset,
             "type": tx, "amount": amount, "amount_mid": mid,
             "date": tx_date, "disclosure_date": disc_date,
@@ -377,117 +1655,1478 @@ def get_fallback_data():
     return trades
 
 
+# ═══════════════════════════════════════════════
+# TRADE STORE (SQLite)
+# ═══════════════════════════════════════════════
+TRADE_FIELDS = ["id", "source", "rep", "party", "ticker", "asset", "type", "amount", "amount_mid",
+                "date", "disclosure_date", "sector", "conflict", "chamber", "owner"]
+
+
+class TradeStore:
+    """정규화된 거래 전체 히스토리를 보관하는 SQLite 저장소 (id 기준 upsert)"""
+    def __init__(self, path=STORE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS trades (
+                id TEXT PRIMARY KEY, source TEXT, rep TEXT, party TEXT, ticker TEXT, asset TEXT,
+                type TEXT, amount TEXT, amount_mid INTEGER, date TEXT, disclosure_date TEXT,
+                sector TEXT, conflict INTEGER, chamber TEXT, owner TEXT,
+                first_seen TEXT, last_seen TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(date);
+            CREATE INDEX IF NOT EXISTS idx_trades_rep ON trades(rep, date);
+            CREATE INDEX IF NOT EXISTS idx_trades_ticker ON trades(ticker, date);
+            CREATE INDEX IF NOT EXISTS idx_trades_sector ON trades(sector, date);
+            CREATE TABLE IF NOT EXISTS agg_days (date TEXT PRIMARY KEY, data TEXT);
+            CREATE TABLE IF NOT EXISTS backfill (source TEXT PRIMARY KEY, key TEXT, next_chunk INTEGER, ids TEXT);
+            CREATE TABLE IF NOT EXISTS backfill_ids (source TEXT, id TEXT, n INTEGER, PRIMARY KEY (source, id));
+        """)
+
+    def close(self):
+        self.db.close()
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def ids(self):
+        """현재 저장된 id 스냅샷 (다른 스레드에서 읽어도 안전한 frozenset)"""
+        return frozenset(r[0] for r in self.db.execute("SELECT id FROM trades"))
+
+    def scan(self, fields):
+        """전체 거래의 일부 컬럼만 dict로 (백필 중복 제거 인덱스 초기화용)"""
+        cur = self.db.execute(f"SELECT {', '.join(fields)} FROM trades")
+        cur.row_factory = None
+        return (dict(zip(fields, r)) for r in cur)
+
+    def upsert(self, trades):
+        """신규 삽입 / 내용이 바뀐 거래만 갱신, 신규 건수 반환
+
+        내용이 같은 거래는 건드리지 않는다 (last_seen = 마지막으로 내용이 바뀐 시각).
+        변경이 없으면 DB 파일도 바뀌지 않아 워크플로가 커밋을 건너뛸 수 있다.
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = {t["id"]: tuple(int(t.get(c) or 0) if c in ("conflict", "amount_mid") else t.get(c) or ""
+                               for c in TRADE_FIELDS) for t in trades}
+        ids = list(rows)
+        current = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for r in self.db.execute(f"SELECT {', '.join(TRADE_FIELDS)} FROM trades "
+                                     f"WHERE id IN ({','.join('?' * len(chunk))})", chunk):
+                current[r[0]] = tuple(r)
+        changed = [row for tid, row in rows.items() if current.get(tid) != row]
+        if not changed:
+            return 0
+        # 일별 집계 무효화: 바뀐 거래의 새 날짜 + (날짜가 바뀐 기존 거래의) 이전 날짜
+        date_at = TRADE_FIELDS.index("date")
+        stale = {row[date_at] for row in changed}
+        stale.update(current[row[0]][date_at] for row in changed if row[0] in current)
+        cols = ", ".join(TRADE_FIELDS)
+        marks = ", ".join("?" for _ in TRADE_FIELDS)
+        updates = ", ".join(f"{c}=excluded.{c}" for c in TRADE_FIELDS[1:])
+        with self.db:
+            self.db.executemany(
+                f"INSERT INTO trades ({cols}, first_seen, last_seen) VALUES ({marks}, ?, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}, last_seen=excluded.last_seen",
+                [row + (now, now) for row in changed])
+            self.db.executemany("DELETE FROM agg_days WHERE date = ?", [(d,) for d in stale])
+        return sum(1 for row in changed if row[0] not in current)
+
+    def reclassify(self):
+        """'기타'로 저장된 거래를 현재 섹터 분류로 다시 매김, 바뀐 건수 반환
+
+        티커 참조가 늘어나면 이번 실행에서 다시 받지 않는 과거 거래에도 반영된다.
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        changed = []
+        for tid, rep, ticker, asset, d in self.db.execute(
+                "SELECT id, rep, ticker, asset, date FROM trades WHERE sector = '기타'"):
+            sector = get_sector(ticker, asset)
+            if sector != "기타":
+                changed.append((sector, int(check_conflict(rep, sector)), now, tid, d))
+        if changed:
+            with self.db:
+                self.db.executemany("UPDATE trades SET sector = ?, conflict = ?, last_seen = ? WHERE id = ?",
+                                    [c[:4] for c in changed])
+                self.db.executemany("DELETE FROM agg_days WHERE date = ?", [(d,) for d in {c[4] for c in changed}])
+        return len(changed)
+
+    def query(self, date_from=None, date_to=None, rep=None, ticker=None, sector=None, limit=None):
+        """인덱스 조건 조회, 최신 거래일 순"""
+        return [self._row(r) for r in self.db.execute(*self._select(date_from, date_to, rep, ticker, sector, limit))]
+
+    def query_table(self, date_from=None, date_to=None, rep=None, ticker=None, sector=None, limit=None):
+        """query()와 같은 조건/순서, 결과는 TradeTable (행 dict 생성 없음)"""
+        cur = self.db.execute(*self._select(date_from, date_to, rep, ticker, sector, limit))
+        cur.row_factory = None
+        return TradeTable.from_rows(cur)
+
+    @staticmethod
+    def _select(date_from, date_to, rep, ticker, sector, limit):
+        where, params = [], []
+        for col, op, val in (("date", ">=", date_from), ("date", "<=", date_to),
+                             ("rep", "=", rep), ("ticker", "=", ticker), ("sector", "=", sector)):
+            if val:
+                where.append(f"{col} {op} ?")
+                params.append(val)
+        sql = f"SELECT {', '.join(TRADE_FIELDS)} FROM trades"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY date DESC, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return sql, params
+
+    def daily_aggregates(self):
+        """일별 부분 집계 {날짜: TradeAggregate}. 무효화된 날짜만 다시 계산"""
+        missing = [r[0] for r in self.db.execute(
+            "SELECT DISTINCT date FROM trades WHERE date NOT IN (SELECT date FROM agg_days)")]
+        if missing:
+            with self.db:
+                for d in missing:
+                    cur = self.db.execute(f"SELECT {', '.join(TRADE_FIELDS)} FROM trades WHERE date = ?", (d,))
+                    cur.row_factory = None
+                    agg = TradeAggregate.from_table(TradeTable.from_rows(cur))
+                    self.db.execute("INSERT OR REPLACE INTO agg_days VALUES (?, ?)",
+                                    (d, json.dumps(agg.to_dict(), ensure_ascii=False)))
+        return {d: TradeAggregate.from_dict(json.loads(data))
+                for d, data in self.db.execute("SELECT date, data FROM agg_days ORDER BY date")}
+
+    def checkpoint(self, source, key):
+        """백필 재개 지점 → (다음 청크 번호, id 중복 카운터). 키가 다르면 처음부터"""
+        row = self.db.execute("SELECT key, next_chunk, ids FROM backfill WHERE source = ?", (source,)).fetchone()
+        if row is None or row["key"] != key:
+            self.clear_checkpoint(source)
+            return 0, {}
+        ids = json.loads(row["ids"]) if row["ids"] else {}  # 예전 형식 (카운터 전체 JSON)
+        ids.update(self.db.execute("SELECT id, n FROM backfill_ids WHERE source = ?", (source,)))
+        return row["next_chunk"], ids
+
+    def save_checkpoint(self, source, key, next_chunk, changed):
+        """재개 지점 + 이번 청크에서 바뀐 id 카운터만 기록 (누적 카운터 전체를 다시 쓰지 않음)"""
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO backfill (source, key, next_chunk) VALUES (?, ?, ?)",
+                            (source, key, next_chunk))
+            self.db.executemany("INSERT OR REPLACE INTO backfill_ids VALUES (?, ?, ?)",
+                                [(source, i, n) for i, n in changed.items()])
+
+    def clear_checkpoint(self, source):
+        with self.db:
+            self.db.execute("DELETE FROM backfill WHERE source = ?", (source,))
+            self.db.execute("DELETE FROM backfill_ids WHERE source = ?", (source,))
+
+    def version(self):
+        """저장소 내용 버전 (건수 + 마지막 변경 시각, 바뀌면 다른 값)"""
+        n, last = self.db.execute("SELECT COUNT(*), MAX(last_seen) FROM trades").fetchone()
+        return hashlib.sha256(f"{n}|{last}".encode()).hexdigest()[:16]
+
+    def data_version(self):
+        """다른 연결이 커밋할 때마다 바뀌는 SQLite 카운터 (변경 감지용, 파일 읽기 없음)"""
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def months(self):
+        """거래가 있는 YYYY-MM 목록 (최신순, 날짜 없는 거래가 있으면 마지막에 "")"""
+        return [r[0] for r in self.db.execute(
+            "SELECT DISTINCT substr(date, 1, 7) AS m FROM trades ORDER BY m DESC")]
+
+    def undated_table(self):
+        """날짜 없는 거래 (TradeTable, id순)"""
+        cur = self.db.execute(f"SELECT {', '.join(TRADE_FIELDS)} FROM trades WHERE date = '' ORDER BY id")
+        cur.row_factory = None
+        return TradeTable.from_rows(cur)
+
+    def delete(self, ids):
+        """id 목록 삭제 (해당 날짜 일별 집계 무효화), 삭제 건수 반환"""
+        ids = list(ids)
+        removed = 0
+        with self.db:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                dates = [r[0] for r in self.db.execute(f"SELECT DISTINCT date FROM trades WHERE id IN ({marks})", chunk)]
+                removed += self.db.execute(f"DELETE FROM trades WHERE id IN ({marks})", chunk).rowcount
+                self.db.executemany("DELETE FROM agg_days WHERE date = ?", [(d,) for d in dates])
+        return removed
+
+    @staticmethod
+    def _row(r):
+        t = dict(r)
+        t["conflict"] = bool(t["conflict"])
+        t["party"] = t["party"] or None
+        return t
+
+
+# ═══════════════════════════════════════════════
+# TRADE TABLE (컬럼형 메모리 표현)
+# ═══════════════════════════════════════════════
+# 반복되는 문자열 필드는 사전 인코딩(코드 배열 + 값 목록), 날짜는 1970-01-01 기준 일수,
+# 금액/이해충돌/가격은 array 컬럼. 행 dict 대비 전체 히스토리 적재 메모리가 수 배 작다.
+TABLE_CATEGORIES = ("source", "rep", "party", "ticker", "asset", "type", "amount", "sector", "chamber", "owner")
+TABLE_DAYS = ("date", "disclosure_date")
+TABLE_PRICES = ("price", "disclosure_price")
+TRADE_FIELD_SET = frozenset(TRADE_FIELDS)
+NO_DATE = -1  # 날짜 컬럼의 "" (음수 -2 이하는 ISO 형식이 아닌 원문, odd_dates 풀 인덱스)
+
+
+@lru_cache(maxsize=None)
+def day_string(day):
+    return (EPOCH + timedelta(days=day)).strftime("%Y-%m-%d")
+
+
+@lru_cache(maxsize=65536)
+def iso_day(date_str):
+    """YYYY-MM-DD 문자열 → 일수 (왕복 변환이 같은 문자열일 때만, 아니면 None)"""
+    day = day_number(date_str)
+    return day if day is not None and day_string(day) == date_str else None
+
+
+class Categorical:
+    """문자열 사전 (값 ↔ 정수 코드). 같은 문자열은 한 번만 보관"""
+    __slots__ = ("values", "codes", "_json")
+
+    def __init__(self):
+        self.values, self.codes, self._json = [], {}, []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def json_values(self):
+        """코드 → 미리 인코딩한 JSON 조각 목록 (값마다 한 번만 json.dumps)"""
+        js = self._json
+        for v in self.values[len(js):]:
+            js.append(json.dumps(v, ensure_ascii=False))
+        return js
+
+
+class TradeRow:
+    """TradeTable 한 행의 읽기/쓰기 뷰 (dict처럼 t["rep"], t.get(), dict(t) 사용 가능)"""
+    __slots__ = ("table", "i")
+
+    def __init__(self, table, i):
+        self.table, self.i = table, i
+
+    def __getitem__(self, key):
+        return self.table.getter(key)(self.i)
+
+    def __setitem__(self, key, value):
+        self.table.set(key, self.i, value)
+
+    def __contains__(self, key):
+        return key in self.table.prices or key in TRADE_FIELD_SET
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return self.table.fields()
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class TradeTable:
+    """거래 목록의 컬럼형 표현
+
+    pools(Categorical)는 take()/sorted_by()/filter()로 만든 하위 테이블과 공유한다.
+    to_json()은 행 dict 없이 컬럼에서 바로 JSON 배열을 만든다
+    (json.dumps(trades, ensure_ascii=False, separators=(",", ":"))와 같은 결과).
+    """
+    def __init__(self, pools=None):
+        self.pools = pools or {k: Categorical() for k in TABLE_CATEGORIES + ("odd_dates",)}
+        self.ids = []
+        self.cats = {k: array("I") for k in TABLE_CATEGORIES}
+        self.days = {k: array("i") for k in TABLE_DAYS}
+        self.amount_mid = array("q")
+        self.conflict = array("b")
+        self.prices = {}  # annotate 후에만 생김 {필드: array("d")}, 값 없음 = NaN
+
+    @classmethod
+    def from_trades(cls, trades):
+        table = cls()
+        for t in trades:
+            table.append(t)
+        return table
+
+    @classmethod
+    def from_rows(cls, rows):
+        """TRADE_FIELDS 순서 튜플(SQLite 결과) → 테이블 (중간 dict 없음)"""
+        table = cls()
+        cats, days, pools = table.cats, table.days, table.pools
+        enc = {k: (cats[k].append, pools[k].encode) for k in TABLE_CATEGORIES}
+        day = table._encode_day
+        for (tid, source, rep, party, ticker, asset, typ, amount, mid,
+             date, ddate, sector, conflict, chamber, owner) in rows:
+            table.ids.append(tid)
+            for k, v in (("source", source), ("rep", rep), ("party", party or None), ("ticker", ticker),
+                         ("asset", asset), ("type", typ), ("amount", amount), ("sector", sector),
+                         ("chamber", chamber), ("owner", owner)):
+                push, code = enc[k]
+                push(code(v))
+            days["date"].append(day(date))
+            days["disclosure_date"].append(day(ddate))
+            table.amount_mid.append(int(mid or 0))
+            table.conflict.append(1 if conflict else 0)
+        return table
+
+    def _encode_day(self, value):
+        if value == "":
+            return NO_DATE
+        day = iso_day(value) if isinstance(value, str) else None
+        return day if day is not None else -2 - self.pools["odd_dates"].encode(value)
+
+    def _decode_day(self, day):
+        if day >= 0:
+            return day_string(day)
+        return "" if day == NO_DATE else self.pools["odd_dates"].values[-2 - day]
+
+    def append(self, t):
+        n = len(self.ids)
+        self.ids.append(t["id"])
+        for k in TABLE_CATEGORIES:
+            self.cats[k].append(self.pools[k].encode(t.get(k)))
+        for k in TABLE_DAYS:
+            self.days[k].append(self._encode_day(t.get(k, "")))
+        self.amount_mid.append(int(t.get("amount_mid") or 0))
+        self.conflict.append(1 if t.get("conflict") else 0)
+        for k in TABLE_PRICES:
+            if k in t or k in self.prices:
+                self._price_column(k, n).append(float("nan") if t.get(k) is None else t[k])
+
+    def _price_column(self, key, n=None):
+        col = self.prices.get(key)
+        if col is None:
+            col = self.prices[key] = array("d", [float("nan")]) * (len(self.ids) if n is None else n)
+        return col
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (TradeRow(self, i) for i in range(len(self.ids)))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(range(len(self.ids))[i])
+        if i < 0:
+            i += len(self.ids)
+        if not 0 <= i < len(self.ids):
+            raise IndexError(i)
+        return TradeRow(self, i)
+
+    def fields(self):
+        return TRADE_FIELDS + [k for k in TABLE_PRICES if k in self.prices]
+
+    def getter(self, key):
+        """필드 → (행 번호 → 값) 함수"""
+        if key == "id":
+            return self.ids.__getitem__
+        if key in self.cats:
+            codes, values = self.cats[key], self.pools[key].values
+            return lambda i: values[codes[i]]
+        if key in self.days:
+            col, decode = self.days[key], self._decode_day
+            return lambda i: decode(col[i])
+        if key == "amount_mid":
+            return self.amount_mid.__getitem__
+        if key == "conflict":
+            col = self.conflict
+            return lambda i: col[i] == 1
+        if key in self.prices:
+            col = self.prices[key]
+            return lambda i: None if col[i] != col[i] else col[i]
+        raise KeyError(key)
+
+    def set(self, key, i, value):
+        if key in self.cats:
+            self.cats[key][i] = self.pools[key].encode(value)
+        elif key in self.days:
+            self.days[key][i] = self._encode_day(value)
+        elif key == "amount_mid":
+            self.amount_mid[i] = int(value or 0)
+        elif key == "conflict":
+            self.conflict[i] = 1 if value else 0
+        elif key in TABLE_PRICES:
+            self._price_column(key)[i] = float("nan") if value is None else value
+        elif key == "id":
+            self.ids[i] = value
+        else:
+            raise KeyError(key)
+
+    def take(self, indices):
+        """행 번호 목록 순서대로 뽑은 새 테이블 (사전 공유)"""
+        indices = list(indices)
+        # itemgetter 하나로 모든 컬럼을 C 루프에서 뽑음 (1건이면 튜플이 아닌 값을 돌려줌)
+        pick = itemgetter(*indices) if len(indices) > 1 else lambda col: [col[i] for i in indices]
+        out = TradeTable(self.pools)
+        out.ids = list(pick(self.ids))
+        for src, dst in ((self.cats, out.cats), (self.days, out.days)):
+            for k, col in src.items():
+                dst[k] = array(col.typecode, pick(col))
+        out.amount_mid = array("q", pick(self.amount_mid))
+        out.conflict = array("b", pick(self.conflict))
+        out.prices = {k: array("d", pick(col)) for k, col in self.prices.items()}
+        return out
+
+    def _sort_key(self, key):
+        if key in self.cats:
+            # 코드 → 값 정렬 순위 (사전 크기만큼만 문자열 비교)
+            values = self.pools[key].values
+            rank = [0] * len(values)
+            for r, c in enumerate(sorted(range(len(values)), key=lambda c: values[c] or "")):
+                rank[c] = r
+            codes = self.cats[key]
+            return lambda i: rank[codes[i]]
+        if key in self.days and not self.pools["odd_dates"].values:
+            return self.days[key].__getitem__  # ""(-1)은 모든 날짜보다 앞
+        return self.getter(key)
+
+    def sorted_by(self, key, reverse=False):
+        """정수 컬럼 기준 안정 정렬한 새 테이블"""
+        return self.take(sorted(range(len(self.ids)), key=self._sort_key(key), reverse=reverse))
+
+    def filter(self, date_from=None, date_to=None, **equals):
+        """거래일 구간(YYYY-MM-DD 포함) + 사전 인코딩 필드 일치 조건"""
+        idx = range(len(self.ids))
+        for k, v in equals.items():
+            code = self.pools[k].codes.get(v)
+            if code is None:
+                return self.take([])
+            col = self.cats[k]
+            idx = [i for i in idx if col[i] == code]
+        if date_from or date_to:
+            lo = day_number(date_from) if date_from else 0
+            hi = day_number(date_to) if date_to else 1 << 31
+            if lo is None or hi is None:
+                raise ValueError(f"날짜 형식 오류: {date_from!r} ~ {date_to!r}")
+            col = self.days["date"]
+            idx = [i for i in idx if lo <= col[i] <= hi]
+        return self.take(idx)
+
+    def group_by(self, key, fn=None):
+        """{값(fn 적용): 하위 테이블}, 값의 첫 등장 순서"""
+        get = self.getter(key)
+        groups = {}
+        for i in range(len(self.ids)):
+            v = get(i)
+            groups.setdefault(fn(v) if fn else v, []).append(i)
+        return {v: self.take(idx) for v, idx in groups.items()}
+
+    def to_dicts(self):
+        getters = [(k, self.getter(k)) for k in self.fields()]
+        return [{k: g(i) for k, g in getters} for i in range(len(self.ids))]
+
+    def _json_column(self, key):
+        """필드 하나의 행별 JSON 조각 목록 (사전 값/날짜는 값마다 한 번만 인코딩)"""
+        if key == "id":
+            return list(map(encode_basestring, self.ids))
+        if key in self.cats:
+            return list(map(self.pools[key].json_values().__getitem__, self.cats[key]))
+        if key in self.days:
+            odd = self.pools["odd_dates"].json_values()
+            cache = {NO_DATE: '""'}
+            def enc(day):
+                js = cache.get(day)
+                if js is None:
+                    js = cache[day] = f'"{day_string(day)}"' if day >= 0 else odd[-2 - day]
+                return js
+            return list(map(enc, self.days[key]))
+        if key == "amount_mid":
+            return list(map(str, self.amount_mid))
+        if key == "conflict":
+            return ["true" if c else "false" for c in self.conflict]
+        return ["null" if p != p else repr(p) for p in self.prices[key]]
+
+    def to_json(self):
+        """JSON 배열 텍스트 (행 dict 없이 컬럼별 조각 → 행 템플릿)"""
+        fields = self.fields()
+        row = "{" + ",".join(f"{encode_basestring(k)}:%s" for k in fields) + "}"
+        cols = [self._json_column(k) for k in fields]
+        return "[" + ",".join(map(row.__mod__, zip(*cols))) + "]"
+
+
+# ═══════════════════════════════════════════════
+# CROSS-SOURCE DEDUPE
+# ═══════════════════════════════════════════════
+# 같은 거래가 여러 소스에 있으면 우선순위가 높은(숫자가 작은) 소스의 레코드를 남긴다
+SOURCE_PRIORITY = {"capitol_trades": 0, "github_senate": 1, "fallback": 9}
+OWNER_ALIASES = {"sp": "spouse", "spouse": "spouse", "jt": "joint", "joint": "joint",
+                 "dc": "child", "child": "child", "dependent": "child", "self": "self"}
+AMOUNT_BANDS = [1001, 15001, 50001, 100001, 250001, 500001, 1000001, 5000001, 25000001, 50000000]
+DEDUPE_FIELDS = ("id", "source", "rep", "ticker", "date", "type", "owner", "amount_mid")  # match()가 읽는 필드
+
+
+@lru_cache(maxsize=8192)
+def member_key(rep):
+    """정식 이름(리졸버) 또는 정규화 토큰 → 소스 간 동일 인물 비교 키"""
+    pol = resolve_politician(rep)
+    return pol.name if pol and pol.name else " ".join(normalize_name(rep))
+
+
+@lru_cache(maxsize=256)
+def owner_key(owner):
+    o = " ".join(normalize_name(owner))
+    return OWNER_ALIASES.get(o, o)
+
+
+def amount_band(mid):
+    return bisect.bisect_right(AMOUNT_BANDS, mid or 0)
+
+
+@lru_cache(maxsize=65536)
+def shift_date(date_str, days):
+    try:
+        return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return date_str
+
+
+class TradeDeduper:
+    """(정식 인물, 티커, 날짜) 블록 해시 + 블록 안에서만 구분/소유자/금액대 비교
+
+    블록 조회는 O(1)이라 전체가 거의 선형 시간. 다른 소스끼리만 병합하며
+    한 레코드는 최대 한 번만 매칭되므로, 같은 날 같은 종목을 여러 번 거래한 경우
+    (같은 소스 안의 반복 거래)는 그대로 남는다. 날짜는 ±1일까지 허용한다.
+    """
+    def __init__(self, trades=()):
+        self.blocks = {}
+        self.used = set()
+        for t in trades:
+            self.add(t)
+
+    def add(self, t):
+        key = (member_key(t["rep"]), t["ticker"], t["date"])
+        self.blocks.setdefault(key, []).append(t)
+
+    def match(self, t):
+        member, owner, band = member_key(t["rep"]), owner_key(t.get("owner")), amount_band(t["amount_mid"])
+        for d in (t["date"], shift_date(t["date"], -1), shift_date(t["date"], 1)):
+            for c in self.blocks.get((member, t["ticker"], d), ()):
+                if c["id"] in self.used or c.get("source") == t.get("source") or c["type"] != t["type"]:
+                    continue
+                co = owner_key(c.get("owner"))
+                if owner and co and owner != co:
+                    continue
+                if c["amount_mid"] and t["amount_mid"] and amount_band(c["amount_mid"]) != band:
+                    continue
+                self.used.add(c["id"])
+                return c
+        return None
+
+    def dedupe(self, incoming):
+        """신규 배치를 블록 인덱스와 비교 → (남길 신규, 삭제할 기존 id, 소스별 병합 수)"""
+        kept, drop, merges = [], [], Counter()
+        for t in incoming:
+            c = self.match(t)
+            if c is None:
+                kept.append(t)
+            elif SOURCE_PRIORITY.get(t.get("source"), 5) < SOURCE_PRIORITY.get(c.get("source"), 5):
+                kept.append(t)
+                drop.append(c["id"])
+                merges[c.get("source")] += 1
+            else:
+                merges[t.get("source")] += 1
+        return kept, drop, merges
+
+
+def dedupe_batch(incoming, existing):
+    """신규 배치를 기존 거래와 비교 → (남길 신규, 삭제할 기존 id, 소스별 병합 수)"""
+    return TradeDeduper(existing).dedupe(incoming)
+
+
+def store_batch(store, trades, deduper=None):
+    """소스 간 중복 제거 후 저장소에 반영 → (신규 건수, 소스별 병합 수)
+
+    deduper를 넘기면 (백필) 저장소를 다시 읽지 않고 그 블록 인덱스와 비교한 뒤
+    남긴 거래의 DEDUPE_FIELDS만 인덱스에 추가한다.
+    """
+    if deduper is None:
+        dates = [t["date"] for t in trades if t.get("date")]
+        existing = store.query(date_from=shift_date(min(dates), -1), date_to=shift_date(max(dates), 1)) if dates else []
+        kept, drop, merges = dedupe_batch(trades, existing)
+    else:
+        kept, drop, merges = deduper.dedupe(trades)
+        for t in kept:
+            deduper.add({k: t.get(k) for k in DEDUPE_FIELDS})
+    store.delete(drop)
+    return store.upsert(kept), merges
+
+
+def format_merges(merges):
+    return ", ".join(f"{src} {n}건" for src, n in sorted(merges.items())) or "없음"
+
+
+# ═══════════════════════════════════════════════
+# INGEST PIPELINE
+# ═══════════════════════════════════════════════
+def build_sources(args, seen=None):
+    """수집 소스 목록 (새 소스 = name/label/produce()/normalize()/select()/finish()를 가진 클래스 추가)"""
+    return [CapitolTradesSource(args.pages, args.concurrency, args.rate, seen=seen), GithubSenateSource()]
+
+
+def run_pipeline(sources, store=None, queue_size=PIPELINE_QUEUE):
+    """소스별 producer 스레드 → 제한 큐 → 정규화/중복 제거 consumer(호출 스레드)
+
+    느린 다운로드(상원 aggregate)와 Capitol Trades 페이징, 정규화가 동시에 진행되어
+    전체 시간이 소스 시간의 합이 아니라 가장 느린 소스에 가까워진다.
+    소스가 끝나는 즉시 그 소스의 거래를 저장소에 중복 제거 후 반영한다.
+    반환: {소스명: {"trades", "added", "merges", "error"}}
+    """
+    q = queue.Queue(maxsize=queue_size)
+    results = {s.name: {"trades": [], "added": 0, "merges": Counter(), "error": None} for s in sources}
+    id_seen = {s.name: {} for s in sources}
+
+    def producer(src):
+        try:
+            with METRICS.stage(f"fetch_{src.name}") as st:
+                n = 0
+                for normalized, batch in src.produce():
+                    n += len(batch)
+                    q.put((src, normalized, batch))
+                st["records_out"] = n
+        except Exception as e:
+            print(f"    ❌ {src.label}: {e}")
+            results[src.name]["error"] = str(e)
+        finally:
+            q.put((src, None, None))
+
+    threads = [threading.Thread(target=producer, args=(s,), name=f"producer-{s.name}", daemon=True) for s in sources]
+    for t in threads:
+        t.start()
+    remaining = len(sources)
+    while remaining:
+        src, normalized, batch = q.get()
+        res = results[src.name]
+        if batch is None:
+            remaining -= 1
+            src.finish(res["trades"], res["error"] is None)
+            if store is not None and res["trades"]:
+                with METRICS.stage(f"store_{src.name}", len(res["trades"])) as st:
+                    res["added"], res["merges"] = store_batch(store, res["trades"])
+                    st.update(records_out=res["added"], merges=dict(res["merges"]))
+            continue
+        if not normalized:
+            batch = src.select(uniquify_ids([t for t in map(src.normalize, batch) if t], id_seen[src.name]))
+        res["trades"].extend(batch)
+    for t in threads:
+        t.join()
+    return results
+
+
+def collect(source):
+    """소스 하나를 저장소 없이 실행해 정규화된 거래 목록 반환"""
+    return run_pipeline([source])[source.name]["trades"]
+
+
+def build_backfill_sources(args):
+    """전체 히스토리: Capitol Trades 전체 페이지 + 상원 기간 제한 없음"""
+    return [CapitolTradesSource(0, args.concurrency, args.rate), GithubSenateSource(days=0)]
+
+
+def normalize_chunk(normalize, items):
+    """프로세스 풀 작업 단위: 원본 청크 → 정규화된 거래 목록 (id 번호 부여 전)"""
+    return [t for t in map(normalize, items) if t]
+
+
+def run_backfill(sources, store, workers=None):
+    """원본 청크를 프로세스 풀에서 정규화하고 청크 순서대로 저장 + 체크포인트
+
+    결과는 완료 순서가 아닌 청크 번호 순서로 반영하므로 id 번호(#n)와 중복 병합 결과가
+    작업자 수와 무관하게 같다. 청크를 저장할 때마다 (다음 청크, 그 청크에서 바뀐 id 카운터)를
+    같은 SQLite 파일에 기록해, 중단된 백필은 다음 실행에서 그 청크부터 이어서 진행한다.
+    소스 간 중복 제거는 저장소를 청크마다 다시 읽지 않고, 시작 시 한 번 만든 블록 인덱스
+    (TradeDeduper)에 저장한 거래를 계속 추가하며 비교한다 → 전체가 거의 선형 시간.
+    반환 형식은 run_pipeline과 같지만 "trades" 대신 "count"만 담는다 (메모리 절약).
+    """
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    deduper = TradeDeduper(store.scan(DEDUPE_FIELDS))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for src in sources:
+            res = results[src.name] = {"count": 0, "added": 0, "merges": Counter(), "error": None}
+            with METRICS.stage(f"backfill_{src.name}") as st:
+                try:
+                    key = src.backfill_key()
+                    start, id_seen = store.checkpoint(src.name, key)
+                    if start:
+                        print(f"    ⏯️ {src.label}: 청크 {start}부터 재개")
+                    pending = []  # 제출 순서 = 청크 순서, 최대 workers*2개만 미리 제출
+
+                    def drain(limit):
+                        while len(pending) > limit:
+                            n, fut = pending.pop(0)
+                            trades = fut.result()
+                            bases = {t["id"] for t in trades}
+                            trades = src.select(uniquify_ids(trades, id_seen))
+                            if trades:
+                                added, merges = store_batch(store, trades, deduper)
+                                res["added"] += added
+                                res["merges"].update(merges)
+                                res["count"] += len(trades)
+                            store.save_checkpoint(src.name, key, n + 1, {b: id_seen[b] for b in bases})
+                            print(f"    💾 {src.label} 청크 {n}: {len(trades)}건 (누적 {res['count']}건)")
+
+                    consumed = 0
+                    try:
+                        for n, items in src.raw_chunks(start):
+                            pending.append((n, pool.submit(normalize_chunk, src.normalize, items)))
+                            consumed += 1
+                            drain(workers * 2)
+                    finally:
+                        drain(0)  # 실패해도 이미 받은 청크까지는 저장 + 체크포인트
+                    if consumed:
+                        store.clear_checkpoint(src.name)
+                    elif start:
+                        print(f"    ⏸️ {src.label}: 청크 {start}부터 받은 청크 없음 (체크포인트 유지)")
+                except Exception as e:
+                    print(f"    ❌ {src.label}: {e} (다음 --backfill 실행에서 재개)")
+                    res["error"] = str(e)
+                st.update(records_out=res["count"], merges=dict(res["merges"]))
+    return results
+
+
 # ═══════════════════════════════════════════════
 # STATS + MAIN
 # ═══════════════════════════════════════════════
+STAT_WINDOWS = (30, 90, 365)
+
+
+class TradeAggregate:
+    """한 번의 순회로 모든 합계/분류를 누적하는 병합 가능한 부분 집계
+
+    청크·소스·날짜별 부분 집계를 merge()로 결합할 수 있으며 결합 순서와 무관하다
+    (합은 교환·결합 법칙, 집합은 합집합, 대표 종목명/정당은 최신 거래일 기준 max).
+    """
+    def __init__(self):
+        self.totals = {"trades": 0, "buy": 0, "sell": 0, "conflicts": 0, "buy_vol": 0, "sell_vol": 0}
+        self.stocks, self.sectors, self.traders = {}, {}, {}
+        self.party = {p: {"buy": 0, "sell": 0, "buy_vol": 0, "sell_vol": 0, "conflicts": 0} for p in ("D", "R")}
+
+    @classmethod
+    def from_trades(cls, trades):
+        agg = cls()
+        for t in trades:
+            agg.add(t)
+        return agg
+
+    @classmethod
+    def from_table(cls, table):
+        """TradeTable 컬럼을 직접 순회 (행 dict 생성 없음)"""
+        agg = cls()
+        types, tickers, assets, sectors, parties, reps, dates = (
+            table.getter(k) for k in ("type", "ticker", "asset", "sector", "party", "rep", "date"))
+        mids, conflicts = table.amount_mid, table.conflict
+        for i in range(len(table)):
+            agg._add(types(i) == "buy", mids[i], conflicts[i], dates(i) or "",
+                     tickers(i), assets(i), sectors(i), parties(i), reps(i))
+        return agg
+
+    def add(self, t):
+        return self._add(t["type"] == "buy", t["amount_mid"] or 0, 1 if t["conflict"] else 0, t.get("date") or "",
+                         t["ticker"], t["asset"], t["sector"], t.get("party"), t["rep"])
+
+    def _add(self, buy, mid, cf, stamp, tk, asset, sec, party, rep):
+        tot = self.totals
+        tot["trades"] += 1
+        tot["conflicts"] += cf
+        if buy:
+            tot["buy"] += 1
+            tot["buy_vol"] += mid
+            st = self.stocks.get(tk)
+            if st is None:
+                st = self.stocks[tk] = {"label": ("", "", ""), "count": 0, "volume": 0, "traders": set(), "conflicts": 0}
+            st["label"] = max(st["label"], (stamp, asset or "", sec or ""))
+            st["count"] += 1
+            st["volume"] += mid
+            st["traders"].add(rep)
+            st["conflicts"] += cf
+            if sec:
+                se = self.sectors.setdefault(sec, {"value": 0, "count": 0, "conflicts": 0})
+                se["value"] += mid
+                se["count"] += 1
+                se["conflicts"] += cf
+        else:
+            tot["sell"] += 1
+            tot["sell_vol"] += mid
+        ps = self.party.get(party)
+        if ps is not None:
+            if buy:
+                ps["buy"] += 1
+                ps["buy_vol"] += mid
+            else:
+                ps["sell"] += 1
+                ps["sell_vol"] += mid
+            ps["conflicts"] += cf
+        tr = self.traders.get(rep)
+        if tr is None:
+            tr = self.traders[rep] = {"label": ("", ""), "buys": 0, "sells": 0, "volume": 0, "tickers": set(), "conflicts": 0}
+        tr["label"] = max(tr["label"], (stamp, party or ""))
+        tr["buys" if buy else "sells"] += 1
+        tr["volume"] += mid
+        tr["tickers"].add(tk)
+        tr["conflicts"] += cf
+        return self
+
+    @staticmethod
+    def _merge_entry(dst, src):
+        for k, v in src.items():
+            if k == "label":
+                dst[k] = max(dst[k], tuple(v))
+            elif isinstance(v, (set, list)):
+                dst[k] |= set(v)
+            else:
+                dst[k] += v
+
+    def merge(self, other):
+        for k, v in other.totals.items():
+            self.totals[k] += v
+        for p, v in other.party.items():
+            for k, n in v.items():
+                self.party[p][k] += n
+        for mine, theirs in ((self.stocks, other.stocks), (self.sectors, other.sectors), (self.traders, other.traders)):
+            for key, entry in theirs.items():
+                if key in mine:
+                    self._merge_entry(mine[key], entry)
+                else:
+                    mine[key] = {k: tuple(v) if k == "label" else set(v) if isinstance(v, (set, list)) else v
+                                 for k, v in entry.items()}
+        return self
+
+    def to_dict(self):
+        """JSON 직렬화용 (집합 → 정렬 리스트)"""
+        conv = lambda d: {k: {kk: sorted(vv) if isinstance(vv, set) else vv for kk, vv in e.items()} for k, e in d.items()}
+        return {"totals": self.totals, "party": self.party, "stocks": conv(self.stocks),
+                "sectors": self.sectors, "traders": conv(self.traders)}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls().merge(_AggView(d))
+
+    def stats(self):
+        """compute_stats() 형식 결과"""
+        popular = sorted(self.stocks.items(), key=lambda kv: (-kv[1]["count"], kv[0]))[:20]
+        popular = [{"ticker": tk, "asset": s["label"][1], "count": s["count"], "volume": s["volume"],
+                    "traders": len(s["traders"]), "conflicts": s["conflicts"], "sector": s["label"][2]}
+                   for tk, s in popular]
+        sectors = sorted(({"name": k, **v} for k, v in self.sectors.items()), key=lambda x: (-x["value"], x["name"]))
+        top = sorted(self.traders.items(), key=lambda kv: (-kv[1]["volume"], kv[0]))[:20]
+        top = [{"name": rep, "party": tr["label"][1] or None, "buys": tr["buys"], "sells": tr["sells"],
+                "volume": tr["volume"], "tickers": len(tr["tickers"]), "conflicts": tr["conflicts"]}
+               for rep, tr in top]
+        return {"popular_stocks": popular, "sectors": sectors,
+                "party_stats": {p: dict(v) for p, v in self.party.items()}, "top_traders": top}
+
+    def summary(self):
+        return {**self.totals, "party_stats": {p: dict(v) for p, v in self.party.items()}}
+
+
+class _AggView:
+    """to_dict() 결과를 merge()에 넘기기 위한 얇은 래퍼"""
+    def __init__(self, d):
+        self.totals, self.party = d["totals"], d["party"]
+        self.stocks, self.sectors, self.traders = d["stocks"], d["sectors"], d["traders"]
+
+
 def compute_stats(trades):
-    stock_map, sector_map, trader_map = {}, {}, {}
-    ps = {"D":{"buy":0,"sell":0,"buy_vol":0,"sell_vol":0,"conflicts":0},
-          "R":{"buy":0,"sell":0,"buy_vol":0,"sell_vol":0,"conflicts":0}}
+    if isinstance(trades, TradeTable):
+        return TradeAggregate.from_table(trades).stats()
+    return TradeAggregate.from_trades(trades).stats()
+
+
+def window_summaries(daily, today=None):
+    """일별 부분 집계 {날짜: TradeAggregate} → 최근 30/90/365일 요약
+
+    기준일을 주지 않으면 실행 시각이 아니라 저장소의 최신 거래일을 기준으로 삼는다
+    (데이터가 그대로면 결과도 그대로 → 통계 해시가 날마다 바뀌지 않음).
+    """
+    if today is None:
+        dates = [d for d in daily if day_number(d) is not None]
+        if not dates:
+            return {f"{days}d": TradeAggregate().summary() for days in STAT_WINDOWS}
+        today = datetime.strptime(max(dates)[:10], "%Y-%m-%d")
+    out = {}
+    for days in STAT_WINDOWS:
+        cutoff = (today - timedelta(days=days)).strftime("%Y-%m-%d")
+        agg = TradeAggregate()
+        for d, part in daily.items():
+            if d >= cutoff:
+                agg.merge(part)
+        out[f"{days}d"] = agg.summary()
+    return out
+
+
+# ═══════════════════════════════════════════════
+# PRICE HISTORY
+# ═══════════════════════════════════════════════
+# .bin 레이아웃 (little-endian, 브라우저 TypedArray로도 바로 읽을 수 있게 4바이트 정렬)
+#   헤더 16B: magic "CTPX", version u16, 예약 u16, 개수 n u32, 예약 u32
+#   days   : u32 × n  (1970-01-01 기준 일수, 오름차순)
+#   closes : f32 × n
+PRICE_MAGIC = b"CTPX"
+PRICE_HEADER = struct.Struct("<4sHHII")
+EPOCH = datetime(1970, 1, 1)
+
+
+def day_number(date_str):
+    """YYYY-MM-DD → 1970-01-01 기준 일수 (형식 오류면 None)"""
+    try:
+        return (datetime.strptime(date_str[:10], "%Y-%m-%d") - EPOCH).days
+    except (TypeError, ValueError):
+        return None
+
+
+def write_price_bin(path, rows):
+    """(day, close) 목록 → .bin (날짜 중복은 마지막 값 사용)"""
+    series = dict(rows)
+    days = array("I", sorted(series))
+    closes = array("f", (series[d] for d in days))
+    if sys.byteorder != "little":
+        days.byteswap()
+        closes.byteswap()
+    _atomic_write(path, PRICE_HEADER.pack(PRICE_MAGIC, 1, 0, len(days), 0) + days.tobytes() + closes.tobytes())
+    return len(days)
+
+
+def read_price_csv(path):
+    """Date/Close(또는 Adj Close) 컬럼이 있는 일별 OHLC CSV → (day, close) 리스트"""
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        cols = {c.strip().lower(): c for c in reader.fieldnames or []}
+        date_col = cols.get("date")
+        close_col = cols.get("close") or cols.get("adj close")
+        if not date_col or not close_col:
+            raise ValueError(f"{path}: Date/Close 컬럼 없음")
+        for r in reader:
+            day = day_number(r[date_col].strip())
+            try:
+                close = float(r[close_col])
+            except (TypeError, ValueError):
+                continue
+            if day is not None:
+                rows.append((day, close))
+    return rows
+
+
+def ingest_prices(csv_dir=PRICE_CSV_DIR, bin_dir=PRICE_BIN_DIR):
+    """CSV가 .bin보다 새로운 티커만 다시 변환, 변환한 티커 수 반환"""
+    if not os.path.isdir(csv_dir):
+        return 0
+    done = 0
+    for name in sorted(os.listdir(csv_dir)):
+        if not name.lower().endswith(".csv"):
+            continue
+        src = os.path.join(csv_dir, name)
+        dst = os.path.join(bin_dir, name[:-4].upper() + ".bin")
+        if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            continue
+        try:
+            write_price_bin(dst, read_price_csv(src))
+            done += 1
+        except (OSError, ValueError) as e:
+            print(f"    ❌ 가격 {name}: {e}")
+    return done
+
+
+class PriceSeries:
+    """mmap된 .bin 한 개 (days/closes는 복사 없는 memoryview)"""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, n, _ = PRICE_HEADER.unpack_from(self.mm, 0)
+        if magic != PRICE_MAGIC or version != 1:
+            self.mm.close()
+            raise ValueError(f"{path}: 가격 파일 형식 아님")
+        self.view = memoryview(self.mm)
+        off = PRICE_HEADER.size
+        self.days = self.view[off:off + 4 * n].cast("I")
+        self.closes = self.view[off + 4 * n:off + 8 * n].cast("f")
+
+    def close_on(self, date_str, tolerance=PRICE_TOLERANCE_DAYS):
+        """date 당일 또는 직전 tolerance일 이내 마지막 종가 (이진 탐색)"""
+        return self.close_on_day(day_number(date_str), tolerance)
+
+    def close_on_day(self, day, tolerance=PRICE_TOLERANCE_DAYS):
+        if day is None or day < 0:
+            return None
+        i = bisect.bisect_right(self.days, day) - 1
+        if i < 0 or day - self.days[i] > tolerance:
+            return None
+        return round(self.closes[i], 2)
+
+    def release(self):
+        self.days.release()
+        self.closes.release()
+        self.view.release()
+        self.mm.close()
+
+
+class PriceStore:
+    """티커별 PriceSeries를 처음 조회할 때 mmap으로 연다"""
+    def __init__(self, bin_dir=PRICE_BIN_DIR):
+        self.bin_dir = bin_dir
+        self.series = {}
+
+    def get(self, ticker):
+        if ticker not in self.series:
+            path = os.path.join(self.bin_dir, f"{ticker}.bin")
+            try:
+                self.series[ticker] = PriceSeries(path) if os.path.exists(path) else None
+            except (OSError, ValueError):
+                self.series[ticker] = None
+        return self.series[ticker]
+
+    def tickers(self):
+        """.bin이 있는 티커 목록 (manifest에 실어 페이지가 있는 파일만 요청하게 함)"""
+        if not os.path.isdir(self.bin_dir):
+            return []
+        return sorted(n[:-4] for n in os.listdir(self.bin_dir) if n.endswith(".bin"))
+
+    def annotate(self, trade):
+        """거래일/공시일 종가를 price/disclosure_price 필드로 추가"""
+        s = self.get(trade.get("ticker") or "")
+        trade["price"] = s.close_on(trade.get("date")) if s else None
+        trade["disclosure_price"] = s.close_on(trade.get("disclosure_date")) if s else None
+        return trade
+
+    def annotate_table(self, table):
+        """TradeTable 버전: 티커 코드별로 시리즈를 한 번만 찾고 일수 컬럼으로 바로 조회"""
+        series = [self.get(tk or "") for tk in table.pools["ticker"].values]
+        tickers = table.cats["ticker"]
+        for field, col in (("price", table.days["date"]), ("disclosure_price", table.days["disclosure_date"])):
+            out = table._price_column(field)
+            for i in range(len(table)):
+                s = series[tickers[i]]
+                p = s.close_on_day(col[i]) if s else None
+                out[i] = float("nan") if p is None else p
+        return table
+
+    def annotate_months(self, months):
+        for month, trades in months:
+            if isinstance(trades, TradeTable):
+                self.annotate_table(trades)
+            else:
+                for t in trades:
+                    self.annotate(t)
+            yield month, trades
+
+    def close(self):
+        for s in self.series.values():
+            if s:
+                s.release()
+        self.series = {}
+
+
+# ═══════════════════════════════════════════════
+# OUTPUT SHARDS
+# ═══════════════════════════════════════════════
+def _write_compressed(path, raw):
+    """raw와 내용이 다를 때만 path + .gz/.br 사전 압축본 기록. 압축본 크기 반환"""
+    sizes = {}
+    variants = [("", lambda b: b), (".gz", lambda b: gzip.compress(b, 9, mtime=0))]
+    if brotli:
+        variants.append((".br", lambda b: brotli.compress(b, quality=11)))
+    unchanged = False
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            unchanged = f.read() == raw
+    for ext, enc in variants:
+        p = path + ext
+        if not unchanged or not os.path.exists(p):
+            _atomic_write(p, enc(raw))
+        sizes[ext.lstrip(".") or "raw"] = os.path.getsize(p)
+    return sizes
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _shard_trades(path):
+    return ((_read_json(path) or {}).get("trades")) or []
+
+
+def seed_store(store, out_dir):
+    """커밋된 샤드(data/shards/*.json) → 빈 저장소 복원, 넣은 건수 반환
+
+    저장소는 CI 캐시로만 이어지므로 캐시가 사라지면 공개된 샤드가 유일한 전체 사본이다.
+    """
+    shard_dir = os.path.join(out_dir, "shards")
+    if not os.path.isdir(shard_dir):
+        return 0
+    added = 0
+    for name in sorted(os.listdir(shard_dir)):
+        if name.endswith(".json"):
+            trades = [t for t in _shard_trades(os.path.join(shard_dir, name)) if t.get("id")]
+            if trades:
+                added += store.upsert(trades)
+    return added
+
+
+UNDATED_SHARD = "undated"   # 날짜 없는 거래 샤드 (월 키 "", manifest 맨 뒤)
+
+
+def write_shards(out_dir, months, updated_at, prices=(), prune=True):
+    """월별 샤드(data/shards/YYYY-MM.json) + manifest.json + delta.json 기록
+
+    months: (YYYY-MM, trades) 이터러블. 월이 ""인 묶음(날짜 없는 거래)은 shards/undated.json으로 맨 뒤에 둔다.
+    샤드는 들여쓰기 없는 JSON이며
+    .gz (brotli 모듈이 있으면 .br도) 사전 압축본을 함께 둔다.
+    manifest에는 샤드별 기간·건수·sha256·크기를 최신순으로, prices에는 가격 .bin이 있는 티커를 기록하고,
+    내용이 같으면 다시 쓰지 않는다.
+    manifest가 바뀌면 sha256이 달라진 샤드만 이전 파일과 비교해 delta.json을 만든다.
+    prune=False면 (새 저장소로 시작한 실행) 이번에 없는 월 샤드를 지우지 않고, 기존보다
+    건수가 적은 월은 기존 샤드를 그대로 둔다 → manifest가 줄어들지 않는다.
+    반환: (manifest, delta | None)
+    """
+    shard_dir = os.path.join(out_dir, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    prev = _read_json(manifest_path) or {}
+    prev_entries = {e.get("month"): e for e in prev.get("shards", [])}
+    prev_sha = {m: e.get("sha256") for m, e in prev_entries.items()}
+    before, after = {}, {}  # 바뀐 샤드의 이전/현재 거래 (id → trade)
+    entries, keep = [], set()
+    for month, trades in months:
+        if not trades:
+            continue
+        name = f"{month or UNDATED_SHARD}.json"
+        if not prune and month in prev_entries and len(trades) < prev_entries[month].get("count", 0):
+            continue  # 기존 샤드 유지 (아래 prune=False 처리에서 manifest 항목도 유지)
+        path = os.path.join(shard_dir, name)
+        body = trades.to_json() if isinstance(trades, TradeTable) else \
+            json.dumps(trades, ensure_ascii=False, separators=(",", ":"))
+        raw = f'{{"month":{json.dumps(month, ensure_ascii=False)},"trades":{body}}}'.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        if prev_sha.get(month) != sha:
+            before.update((t["id"], t) for t in _shard_trades(path))
+            after.update((t["id"], t) for t in (trades.to_dicts() if isinstance(trades, TradeTable) else trades))
+        sizes = _write_compressed(path, raw)
+        keep.update({name, name + ".gz", name + ".br"})
+        dates = [t["date"] for t in trades if t.get("date")]
+        entries.append({
+            "month": month, "path": f"shards/{name}", "count": len(trades),
+            "first_date": min(dates) if dates else "", "last_date": max(dates) if dates else "",
+            "sha256": sha, "bytes": sizes,
+        })
+    if not prune:
+        written = {e["month"] for e in entries}
+        for month, e in prev_entries.items():
+            name = f"{month or UNDATED_SHARD}.json"
+            if month not in written and os.path.exists(os.path.join(shard_dir, name)):
+                entries.append(e)
+                keep.update({name, name + ".gz", name + ".br"})
+    for n in os.listdir(shard_dir):
+        if n not in keep:
+            if n.endswith(".json"):
+                before.update((t["id"], t) for t in _shard_trades(os.path.join(shard_dir, n)))
+            os.remove(os.path.join(shard_dir, n))
+    entries.sort(key=lambda e: e["month"], reverse=True)
+    manifest = {"updated_at": updated_at, "total_trades": sum(e["count"] for e in entries),
+                "prices": list(prices), "shards": entries}
+    changed, version = write_if_changed(manifest_path, manifest, separators=(",", ":"))
+    if not changed:
+        return prev, None
+    return manifest, write_delta(out_dir, prev.get("content_sha256"), version, updated_at, before, after)
+
+
+def write_delta(out_dir, prev_version, version, updated_at, before, after):
+    """직전 스냅샷 → 현재 스냅샷 사이 추가/수정/삭제 거래 (data/delta.json)
+
+    from이 클라이언트가 가진 버전(manifest content_sha256)과 같을 때만 증분 적용 가능.
+    이전 스냅샷 버전을 모르면 full=true (전체 다시 받기).
+    """
+    full = prev_version is None
+    delta = {
+        "from": prev_version, "to": version, "updated_at": updated_at, "full": full,
+        "added": [] if full else [t for i, t in after.items() if i not in before],
+        "updated": [] if full else [t for i, t in after.items() if i in before and before[i] != t],
+        "removed": [] if full else sorted(i for i in before if i not in after),
+    }
+    _atomic_write(os.path.join(out_dir, "delta.json"),
+                  json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return delta
+
+
+SORT_COLUMNS = {"date": "date", "rep": "rep", "party": "party", "ticker": "ticker",
+                "type": "type", "amount": "amount_mid", "sector": "sector"}
+
+
+class TradeIndexer:
+    """출력 거래 순서(샤드 최신순 연결 = congress_trades.json trades 접두) 기준 위치 인덱스
+
+    by_ticker/by_rep/by_party/by_sector: 값 → 오름차순 위치 리스트
+    conflict: 이해충돌 거래 위치, order: 정렬 컬럼별 내림차순 위치 순열
+    """
+    def __init__(self):
+        self.n = 0
+        self.groups = {k: {} for k in ("ticker", "rep", "party", "sector")}
+        self.conflict = []
+        self.columns = {k: [] for k in SORT_COLUMNS}
+
+    def add(self, t):
+        pos = self.n
+        self.n += 1
+        for k, g in self.groups.items():
+            g.setdefault(t.get(k) or "", []).append(pos)
+        if t.get("conflict"):
+            self.conflict.append(pos)
+        for k, field in SORT_COLUMNS.items():
+            self.columns[k].append(t.get(field) or (0 if field == "amount_mid" else ""))
+
+    def feed_months(self, months):
+        for month, trades in months:
+            for t in trades:
+                self.add(t)
+            yield month, trades
+
+    def to_dict(self):
+        # 내림차순, 동률은 위치 오름차순 (reverse=True도 안정 정렬)
+        order = {k: sorted(range(self.n), key=col.__getitem__, reverse=True) for k, col in self.columns.items()}
+        return {"total": self.n, **{f"by_{k}": g for k, g in self.groups.items()},
+                "conflict": self.conflict, "order": order}
+
+
+def merge_daily(daily):
+    """일별 부분 집계 → (totals, stats) (거래 목록 재순회 없음, 최근 구간 요약 포함)"""
+    agg = TradeAggregate()
+    for part in daily.values():
+        agg.merge(part)
+    stats = agg.stats()
+    stats["windows"] = window_summaries(daily)
+    return agg.totals, stats
+
+
+def summary_output(totals, stats, updated_at, trades=None):
+    """congress_trades.json 요약 (trades=None이면 거래 목록 없이, serve API /api/summary와 공유)"""
+    output = {
+        "updated_at": updated_at,
+        "total_trades": totals["trades"],
+        "total_buy": totals["buy"],
+        "total_sell": totals["sell"],
+        "total_conflicts": totals["conflicts"],
+    }
+    if trades is not None:
+        output["trades"] = trades
+    output["stats"] = stats
+    output["politician_info"] = {k: {kk: vv for kk, vv in v.items() if kk != "party"} for k, v in POLITICIAN_INFO.items()}
+    output["sector_jurisdiction"] = SECTOR_JURISDICTION_MAP
+    return output
+
+
+def fallback_snapshot():
+    """내장 데이터 → (최신순 TradeTable, 일별 부분 집계) — 저장소가 비었을 때"""
+    table = TradeTable.from_trades(get_fallback_data()).sorted_by("date", reverse=True)
+    return table, {d: TradeAggregate.from_table(t) for d, t in sorted(table.group_by("date").items())}
+
+
+def group_by_month(trades):
+    if isinstance(trades, TradeTable):
+        groups = trades.group_by("date", lambda d: (d or "")[:7])
+        return sorted(groups.items(), key=lambda mt: mt[0], reverse=True)
+    months = {}
     for t in trades:
-        if t["type"] == "buy":
-            tk = t["ticker"]
-            if tk not in stock_map:
-                stock_map[tk] = {"ticker":tk,"asset":t["asset"],"count":0,"volume":0,"traders":set(),"conflicts":0,"sector":t["sector"]}
-            stock_map[tk]["count"] += 1
-            stock_map[tk]["volume"] += t["amount_mid"]
-            stock_map[tk]["traders"].add(t["rep"])
-            if t["conflict"]: stock_map[tk]["conflicts"] += 1
-            sec = t["sector"]
-            if sec:
-                if sec not in sector_map: sector_map[sec] = {"name":sec,"value":0,"count":0,"conflicts":0}
-                sector_map[sec]["value"] += t["amount_mid"]
-                sector_map[sec]["count"] += 1
-                if t["conflict"]: sector_map[sec]["conflicts"] += 1
-        p = t.get("party")
-        if p in ps:
-            if t["type"] == "buy": ps[p]["buy"] += 1; ps[p]["buy_vol"] += t["amount_mid"]
-            else: ps[p]["sell"] += 1; ps[p]["sell_vol"] += t["amount_mid"]
-            if t["conflict"]: ps[p]["conflicts"] += 1
-        rep = t["rep"]
-        if rep not in trader_map:
-            trader_map[rep] = {"name":rep,"party":t["party"],"buys":0,"sells":0,"volume":0,"tickers":set(),"conflicts":0}
-        if t["type"] == "buy": trader_map[rep]["buys"] += 1
-        else: trader_map[rep]["sells"] += 1
-        trader_map[rep]["volume"] += t["amount_mid"]
-        trader_map[rep]["tickers"].add(t["ticker"])
-        if t["conflict"]: trader_map[rep]["conflicts"] += 1
-    popular = sorted(stock_map.values(), key=lambda x: x["count"], reverse=True)[:20]
-    for s in popular: s["traders"] = len(s["traders"])
-    sectors = sorted(sector_map.values(), key=lambda x: x["value"], reverse=True)
-    top = sorted(trader_map.values(), key=lambda x: x["volume"], reverse=True)[:20]
-    for tr in top: tr["tickers"] = len(tr["tickers"])
-    return {"popular_stocks":popular, "sectors":sectors, "party_stats":ps, "top_traders":top}
-
-
-def main():
+        months.setdefault((t.get("date") or "")[:7], []).append(t)
+    return sorted(months.items(), key=lambda mt: mt[0], reverse=True)
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="미국 의회 주식 거래 데이터 수집")
+    ap.add_argument("--pages", type=int, default=CT_MAX_PAGES,
+                    help=f"Capitol Trades 최대 페이지 수 (0 = 전체, 기본 {CT_MAX_PAGES})")
+    ap.add_argument("--concurrency", type=int, default=CT_CONCURRENCY, help="동시 요청 수")
+    ap.add_argument("--rate", type=float, default=CT_RATE, help="초당 최대 요청 수")
+    ap.add_argument("--offline", action="store_true", help="네트워크 없이 캐시만 사용")
+    ap.add_argument("--no-cache", action="store_true", help="HTTP 디스크 캐시 비활성화")
+    ap.add_argument("--full", action="store_true", help="저장소에 있는 거래를 만나도 페이징 계속")
+    ap.add_argument("--backfill", action="store_true",
+                    help="전체 히스토리 수집 (기간/페이지 제한 없음, 프로세스 풀 정규화, 중단 시 재개)")
+    ap.add_argument("--workers", type=int, default=0, help="백필 정규화 프로세스 수 (0 = CPU 코어 수)")
+    ap.add_argument("--store", default=STORE_PATH, help="거래 저장소(SQLite) 경로")
+    ap.add_argument("--prices", default=PRICE_CSV_DIR, help="일별 가격 CSV 디렉터리 (<TICKER>.csv)")
+    ap.add_argument("--metrics", default=METRICS_PATH, help="실행 지표 JSON 경로")
+    ap.add_argument("--profile", metavar="PATH", help="cProfile 결과(.prof) 저장 경로")
+    ap.add_argument("--tracemalloc", action="store_true", help="실행 전체 Python 힙 최대치 기록 (느려짐)")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiler = cProfile.Profile() if args.profile else None
+    if args.tracemalloc:
+        tracemalloc.start()
+        METRICS.tracemalloc = True
+    if profiler:
+        profiler.enable()
+    try:
+        run(args)
+    finally:
+        HTTP.close()
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"🔬 프로파일: {args.profile}")
+        METRICS.print_summary()
+        METRICS.write(args.metrics)
+        print(f"📈 지표: {args.metrics}")
+        METRICS.write_step_summary()
+
+
+def run(args):
+    HTTP_CACHE.offline = args.offline
+    HTTP_CACHE.enabled = not args.no_cache or args.offline
     print("🏛️ 미국 의회 주식 거래 데이터 수집 시작")
     print(f"  📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("  ★ API 키 불필요 ★")
+    print("  ★ API 키 불필요 ★" + (" (오프라인 캐시 모드)" if args.offline else ""))
     print()
 
-    all_trades = []
+    if args.store == STORE_PATH and not os.path.exists(STORE_PATH) and os.path.exists(LEGACY_STORE_PATH):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        os.replace(LEGACY_STORE_PATH, STORE_PATH)  # 예전 data/trades.db → .state/ (1회)
+        print(f"  🚚 저장소 이동: data/trades.db → {os.path.relpath(STORE_PATH, BASE_DIR)}")
+    store = TradeStore(args.store)
+    out_dir = os.path.join(BASE_DIR, "data")
+    fresh = store.count() == 0
+    if fresh:
+        # 캐시 유실/첫 실행: 공개된 샤드에서 히스토리 복원, 이번 실행은 샤드/manifest를 줄이지 않음
+        with METRICS.stage("seed_store") as st:
+            st["records_out"] = seeded = seed_store(store, out_dir)
+        if seeded:
+            print(f"  🌱 저장소 없음 → 커밋된 샤드에서 {seeded}건 복원")
+    known = store.count()
+    print(f"  🗄️ 저장소: {known}건 보유")
+    seen = None if args.full or not known else store.ids().__contains__
+    fetched = 0
 
-    # 1차: Capitol Trades
-    print("[1/3] Capitol Trades에서 수집 시도...")
-    ct = fetch_capitol_trades()
-    if ct:
-        all_trades.extend(ct)
-        print(f"  ✅ Capitol Trades: {len(ct)}건\n")
+    # 1~2차: 모든 소스를 동시에 수집 + 정규화 + 중복 제거
+    if args.backfill:
+        sources = build_backfill_sources(args)
+        print(f"[1/2] 전체 히스토리 백필 ({', '.join(s.label for s in sources)})...")
+        with METRICS.stage("ingest") as st:
+            results = run_backfill(sources, store, args.workers)
+            st["records_out"] = sum(r["count"] for r in results.values())
     else:
-        print("  ⚠️ Capitol Trades 실패, 다음 소스...\n")
-
-    # 2차: GitHub Senate
-    print("[2/3] GitHub 상원 데이터 수집 시도...")
-    gh = fetch_github_senate()
-    if gh:
-        # 중복 제거 (Capitol Trades에 이미 있는 거래)
-        existing = {f"{t['rep']}|{t['ticker']}|{t['date']}" for t in all_trades}
-        new = [t for t in gh if f"{t['rep']}|{t['ticker']}|{t['date']}" not in existing]
-        all_trades.extend(new)
-        print(f"  ✅ GitHub 추가: {len(new)}건 (중복 제외)\n")
-    else:
-        print("  ⚠️ GitHub 실패\n")
+        sources = build_sources(args, seen)
+        print(f"[1/2] {len(sources)}개 소스 동시 수집 ({', '.join(s.label for s in sources)})...")
+        with METRICS.stage("ingest") as st:
+            results = run_pipeline(sources, store)
+            for r in results.values():
+                r["count"] = len(r.pop("trades"))
+            st["records_out"] = sum(r["count"] for r in results.values())
+    print()
+    for src in sources:
+        r = results[src.name]
+        fetched += r["count"]
+        if r["count"]:
+            print(f"  ✅ {src.label}: {r['count']}건 (신규 {r['added']}건, 중복 병합: {format_merges(r['merges'])})")
+        else:
+            METRICS.warn(f"{src.label} 0건")
+    with METRICS.stage("classify") as st:
+        st["records_out"] = reclassified = store.reclassify()
+    if reclassified:
+        print(f"  🏷️ 섹터 재분류: {reclassified}건 (티커 참조 {TICKERS.count}종목)")
+    print()
 
-    # 3차: 내장 데이터 (fallback)
-    if len(all_trades) < 10:
-        print("[3/3] 내장 데이터로 대체...")
-        all_trades = get_fallback_data()
+    # 3차: 내장 데이터 (fallback, 저장소에는 넣지 않음)
+    if store.count() < 10:
+        published = (_read_json(os.path.join(out_dir, "manifest.json")) or {}).get("total_trades", 0)
+        if published:
+            METRICS.warn(f"저장소 10건 미만 → 공개된 {published}건을 내장 데이터로 덮어쓰지 않고 종료")
+            print(f"⚠️ 수집 실패: 공개된 데이터({published}건) 유지, 출력 생략")
+            store.close()
+            return
+        METRICS.warn("저장소 10건 미만 → 내장 데이터 사용")
+        print("[2/2] 내장 데이터로 대체...")
+        all_trades, daily = fallback_snapshot()
         print()
+        months = group_by_month(all_trades)
     else:
-        print(f"[3/3] 충분한 데이터 수집됨, 내장 데이터 불필요\n")
+        print(f"[2/2] 충분한 데이터 수집됨, 내장 데이터 불필요\n")
+        with METRICS.stage("load_store") as st:
+            all_trades = store.query_table(limit=500)
+            daily = store.daily_aggregates()
+            st["records_out"] = len(daily)
+        months = ((m, store.query_table(date_from=f"{m}-01", date_to=f"{m}-31") if m else store.undated_table())
+                  for m in store.months())
 
-    # 정렬
-    all_trades.sort(key=lambda x: x.get("date", ""), reverse=True)
+    # 통계 (일별 부분 집계 병합, 거래 목록 재순회 없음)
+    with METRICS.stage("stats", sum(part.totals["trades"] for part in daily.values())) as st:
+        totals, stats = merge_daily(daily)
+        st["records_out"] = totals["trades"]
 
-    print(f"📊 최종: {len(all_trades)}건")
-    print(f"   매수: {sum(1 for t in all_trades if t['type']=='buy')}건")
-    print(f"   매도: {sum(1 for t in all_trades if t['type']=='sell')}건")
-    print(f"   💎 이해충돌: {sum(1 for t in all_trades if t['conflict'])}건")
+    print(f"📊 최종: {totals['trades']}건 (이번 실행 수집 {fetched}건)")
+    print(f"   매수: {totals['buy']}건")
+    print(f"   매도: {totals['sell']}건")
+    print(f"   💎 이해충돌: {totals['conflicts']}건")
     print()
 
-    # 통계
-    stats = compute_stats(all_trades)
+    # 가격 (CSV → .bin 변환 후 거래일/공시일 종가 부착)
+    with METRICS.stage("prices", len(all_trades)) as st:
+        if not os.path.isdir(args.prices):
+            st["skipped"] = f"{os.path.relpath(args.prices, BASE_DIR)}/ 없음"
+            print(f"💵 가격 CSV 디렉터리 없음 ({args.prices}) → 변환 생략, 기존 data/prices/*.bin만 사용\n")
+        converted = ingest_prices(args.prices, PRICE_BIN_DIR)
+        prices = PriceStore(PRICE_BIN_DIR)
+        prices.annotate_table(all_trades)
+        st["converted"] = converted
+    months = prices.annotate_months(months)
+    if converted:
+        print(f"💵 가격 변환: {converted}개 티커\n")
 
     # 저장
-    output = {
-        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S KST"),
-        "total_trades": len(all_trades),
-        "total_buy": sum(1 for t in all_trades if t["type"] == "buy"),
-        "total_sell": sum(1 for t in all_trades if t["type"] == "sell"),
-        "total_conflicts": sum(1 for t in all_trades if t["conflict"]),
-        "trades": all_trades[:500],
-        "stats": stats,
-        "politician_info": {k: {kk:vv for kk,vv in v.items() if kk != "party"} for k,v in POLITICIAN_INFO.items()},
-        "sector_jurisdiction": SECTOR_JURISDICTION_MAP,
-    }
+    updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S KST")
+    output = summary_output(totals, stats, updated_at, all_trades[:500].to_dicts())
 
-    out_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
     os.makedirs(out_dir, exist_ok=True)
     path = os.path.join(out_dir, "congress_trades.json")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-    print(f"✅ 저장: {path} ({os.path.getsize(path)/1024:.1f}KB)")
+    # summary.json = 거래 목록 없는 요약 (index.html 첫 화면은 이것 + 최신 샤드만 받음)
+    summary_path = os.path.join(out_dir, "summary.json")
+    with METRICS.stage("write_summary", len(all_trades)):
+        changed, _ = write_if_changed(path, output, indent=2)
+        write_if_changed(summary_path, summary_output(totals, stats, updated_at), separators=(",", ":"))
+    if changed:
+        print(f"✅ 저장: {path} ({os.path.getsize(path)/1024:.1f}KB), 요약 {os.path.getsize(summary_path)/1024:.1f}KB")
+    else:
+        print(f"⏭️ 변경 없음: {path} (기록 생략)")
+    with METRICS.stage("write_shards") as st:
+        indexer = TradeIndexer()
+        manifest, delta = write_shards(out_dir, indexer.feed_months(months), output["updated_at"], prices.tickers(),
+                                       prune=not fresh)
+        if fresh:  # 유지된 기존 샤드가 섞였을 수 있음 → 실제 샤드 순서로 인덱스 다시 구성
+            indexer = TradeIndexer()
+            for e in manifest["shards"]:
+                for t in _shard_trades(os.path.join(out_dir, e["path"])):
+                    indexer.add(t)
+        store.close()
+        prices.close()
+        raw = json.dumps(indexer.to_dict(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        _write_compressed(os.path.join(out_dir, "index.json"), raw)
+        st["records_out"] = manifest["total_trades"]
+    print(f"✅ 샤드: {len(manifest['shards'])}개월 / {manifest['total_trades']}건 → {os.path.join(out_dir, 'manifest.json')}")
+    if delta is None:
+        print("⏭️ 스냅샷 변경 없음 (manifest/delta 유지)")
+    elif delta["full"]:
+        print("🔀 delta: 이전 스냅샷 없음 → 전체 갱신 표시")
+    else:
+        print(f"🔀 delta: 추가 {len(delta['added'])}건, 수정 {len(delta['updated'])}건, 삭제 {len(delta['removed'])}건")
+    pruned = HTTP_CACHE.prune()
+    if pruned:
+        print(f"🧹 캐시 정리: {pruned}개 파일 삭제")
     print("🎉 완료!")
 
 
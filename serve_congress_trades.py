@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+의회 주식 거래 로컬 조회 서버
+★ 외부 의존성 없음 ★
+- 저장소(.state/trades.db) 전체를 컬럼형 TradeTable 하나로 메모리에 올리고
+  rep/ticker/party/sector/type/충돌 위치 인덱스 + 거래일 구간(이진 탐색)으로 조회
+- 정렬은 컬럼별 순열을 처음 요청될 때 한 번 만들고, 필터 없는 조회는 순열을 잘라 응답
+  → 응답 시간이 전체 건수가 아니라 페이지 크기(필터가 있으면 가장 작은 인덱스 크기)에 비례
+- 일별 부분 집계로 /api/stats 구간 통계를 바로 병합
+- 응답 캐시(LRU + ETag)는 수집기가 저장소에 커밋하면 (PRAGMA data_version) 새 스냅샷과 함께 비워짐
+- index.html / data/ 정적 파일도 함께 서빙 → index.html은 ct-api 메타를 켜서 내려주므로 보이는 행만 요청
+
+사용법:
+  python serve_congress_trades.py                     # http://127.0.0.1:8000
+  python serve_congress_trades.py --port 8080 --store .state/trades.db
+
+API:
+  GET /api/summary                                    헤더 카운트 + stats + 위원회 정보 (거래 목록 제외)
+  GET /api/trades?party=D&conflict=1&sort=amount&dir=desc&offset=0&limit=100
+      필터: rep, ticker, party, sector, type, conflict=1, from/to (YYYY-MM-DD)
+      정렬: date(기본) rep party ticker type amount sector, dir=desc|asc
+  GET /api/stats?from=2025-01-01&to=2025-03-31        구간 통계 (일별 집계 병합)
+"""
+
+import argparse
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl
+
+import fetch_congress_trades as fct
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PORT = 8000
+PAGE_SIZE = 100           # limit 기본값
+MAX_PAGE_SIZE = 1000
+RESPONSE_CACHE_SIZE = 256  # 스냅샷당 캐시할 응답 수 (LRU)
+RELOAD_INTERVAL = 2.0      # 저장소 변경 확인 최소 간격 (초)
+GZIP_MIN_BYTES = 1024
+FILTER_FIELDS = ("rep", "ticker", "party", "sector", "type")
+STATIC_FILES = ("/data/",)
+API_META_OFF = b'<meta name="ct-api" content="off">'
+API_META_ON = b'<meta name="ct-api" content="on">'
+
+
+class QueryError(ValueError):
+    """잘못된 쿼리 파라미터 (400 응답)"""
+
+
+# ═══════════════════════════════════════════════
+# SNAPSHOT + INDEXES
+# ═══════════════════════════════════════════════
+class TradeSnapshot:
+    """한 시점의 저장소 전체 (읽기 전용) + 조회 인덱스 + 응답 캐시
+
+    table은 최신 거래일 순(date DESC, id)이라 위치 번호 자체가 기본 정렬 순서이고,
+    거래일 구간은 연속된 위치 구간이 된다.
+    postings[field][code]: 해당 값을 가진 위치 (오름차순 array("I"))
+    """
+    def __init__(self, table, daily, version, updated_at):
+        self.table, self.daily, self.version = table, daily, version
+        self.dates = sorted(daily)
+        n = len(table)
+        self.postings = {}
+        for field in FILTER_FIELDS:
+            lists = [array("I") for _ in table.pools[field].values]
+            for i, code in enumerate(table.cats[field]):
+                lists[code].append(i)
+            self.postings[field] = lists
+        self.conflict = array("I", (i for i, c in enumerate(table.conflict) if c))
+        # 거래일 구간 → 위치 구간 (내림차순 일수를 부호 반전해 bisect, 비ISO 원문 날짜가 섞이면 선형 검사)
+        self.neg_days = array("i", (-d for d in table.days["date"]))
+        self.contiguous = all(self.neg_days[i] <= self.neg_days[i + 1] for i in range(n - 1))
+        self.orders, self.ranks = {}, {}
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        totals, stats = fct.merge_daily(daily)
+        self.summary = fct.summary_output(totals, stats, updated_at)
+        self.summary["version"] = version
+        self.summary["prices"] = fct.PriceStore().tickers()  # 정적 manifest의 prices와 같은 용도
+
+    # ── 정렬 순열 (컬럼별 lazily) ──
+    def order(self, column):
+        """정렬 컬럼 내림차순 위치 순열 (동률은 위치 오름차순 = TradeIndexer.order와 같음)"""
+        with self.lock:
+            if column not in self.orders:
+                t = self.table
+                field = fct.SORT_COLUMNS[column]
+                key = t.amount_mid.__getitem__ if field == "amount_mid" else t._sort_key(field)
+                order = array("I", sorted(range(len(t)), key=key, reverse=True))
+                rank = array("I", [0]) * len(order)
+                for r, p in enumerate(order):
+                    rank[p] = r
+                self.orders[column], self.ranks[column] = order, rank
+            return self.orders[column], self.ranks[column]
+
+    # ── 조회 ──
+    def day_range(self, date_from, date_to):
+        """거래일 구간(포함) → 위치 구간 [lo, hi), 형식 오류면 QueryError"""
+        lo_day = fct.day_number(date_from) if date_from else None
+        hi_day = fct.day_number(date_to) if date_to else None
+        if (date_from and lo_day is None) or (date_to and hi_day is None):
+            raise QueryError(f"날짜 형식 오류: {date_from!r} ~ {date_to!r}")
+        if lo_day is None and hi_day is None:
+            return 0, len(self.table), None, None
+        lo = bisect.bisect_left(self.neg_days, -hi_day) if hi_day is not None else 0
+        hi = bisect.bisect_right(self.neg_days, -lo_day if lo_day is not None else 0)  # 날짜 없는 거래("")는 제외
+        return lo, max(lo, hi), lo_day, hi_day
+
+    def match(self, filters, conflict=False, date_from=None, date_to=None):
+        """조건에 맞는 위치 (오름차순 = 최신순). 가장 작은 인덱스에서 시작해 나머지는 컬럼 값으로 검사"""
+        t = self.table
+        lo, hi, lo_day, hi_day = self.day_range(date_from, date_to)
+        checks, lists = [], []  # checks: (컬럼, 기대 코드)
+        for field, value in filters.items():
+            code = t.pools[field].codes.get(value)
+            if code is None:
+                return []
+            lists.append(self.postings[field][code])
+            checks.append((t.cats[field], code))
+        if conflict:
+            lists.append(self.conflict)
+            checks.append((t.conflict, 1))
+        ranged = not self.contiguous and (date_from or date_to)
+        if ranged:
+            lo, hi = 0, len(t)
+        if lists:
+            base = min(lists, key=len)
+            base = base[bisect.bisect_left(base, lo):bisect.bisect_left(base, hi)]
+        else:
+            base = range(lo, hi)
+            if not ranged:
+                return base
+        days = t.days["date"]
+        lo_day = 0 if lo_day is None else lo_day
+        hi_day = 1 << 31 if hi_day is None else hi_day
+        return [p for p in base
+                if all(col[p] == want for col, want in checks) and (not ranged or lo_day <= days[p] <= hi_day)]
+
+    def query(self, params):
+        """/api/trades 파라미터 → 응답 바이트 (JSON)"""
+        filters = {k: params[k] for k in FILTER_FIELDS if params.get(k)}
+        conflict = params.get("conflict", "") in ("1", "true", "yes")
+        sort = params.get("sort") or "date"
+        if sort not in fct.SORT_COLUMNS:
+            raise QueryError(f"정렬 컬럼 오류: {sort!r}")
+        asc = params.get("dir", "desc") == "asc"
+        try:
+            offset = max(0, int(params.get("offset") or 0))
+            limit = min(MAX_PAGE_SIZE, max(0, int(params.get("limit") or PAGE_SIZE)))
+        except ValueError:
+            raise QueryError("offset/limit은 정수") from None
+        positions = self.match(filters, conflict, params.get("from"), params.get("to"))
+        total = len(positions)
+        if sort != "date":
+            order, rank = self.order(sort)
+            if isinstance(positions, range) and total == len(self.table):
+                positions = order  # 필터 없음: 순열을 그대로 잘라 쓴다
+            else:
+                positions = sorted(positions, key=rank.__getitem__)
+        # 오름차순은 내림차순 결과를 뒤에서부터 (index.html의 IX 정렬과 같은 동률 순서)
+        end = min(total, offset + limit)
+        page = [positions[total - 1 - i] for i in range(offset, end)] if asc else list(positions[offset:end])
+        head = json.dumps({"version": self.version, "total": total, "offset": offset, "limit": limit})
+        return f'{head[:-1]},"trades":{self.table.take(page).to_json()}}}'.encode("utf-8")
+
+    def stats(self, params):
+        """/api/stats: 구간 안 일별 부분 집계만 병합"""
+        date_from, date_to = params.get("from") or "", params.get("to") or ""
+        for d in (date_from, date_to):
+            if d and fct.day_number(d) is None:
+                raise QueryError(f"날짜 형식 오류: {d!r}")
+        lo = bisect.bisect_left(self.dates, date_from) if date_from else 0
+        hi = bisect.bisect_right(self.dates, date_to) if date_to else len(self.dates)
+        agg = fct.TradeAggregate()
+        for d in self.dates[lo:hi]:
+            agg.merge(self.daily[d])
+        out = {"version": self.version, "from": date_from, "to": date_to, **agg.totals, "stats": agg.stats()}
+        return json.dumps(out, ensure_ascii=False).encode("utf-8")
+
+    # ── 응답 캐시 ──
+    def cached(self, key, build):
+        """key → (ETag, 본문, gzip 본문|None). 스냅샷이 바뀌면 캐시도 통째로 버려진다"""
+        with self.lock:
+            hit = self.cache.get(key)
+            if hit is not None:
+                self.cache.move_to_end(key)
+                return hit
+        body = build()
+        gz = gzip.compress(body, 6, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        etag = '"%s-%s"' % (self.version, hashlib.sha256(repr(key).encode()).hexdigest()[:12])
+        entry = (etag, body, gz)
+        with self.lock:
+            self.cache[key] = entry
+            while len(self.cache) > RESPONSE_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return entry
+
+
+class TradeService:
+    """저장소 → 현재 TradeSnapshot. 요청 때 (최대 RELOAD_INTERVAL마다) 커밋 여부를 보고 다시 로드
+
+    로드하는 동안 다른 요청은 이전 스냅샷으로 계속 응답한다.
+    """
+    def __init__(self, store_path):
+        self.store = fct.TradeStore(store_path)
+        self.lock = threading.Lock()
+        self.checked = 0.0
+        self.data_version = None
+        self.snapshot = None
+        self.reload()
+
+    def reload(self):
+        t0 = time.perf_counter()
+        self.data_version = self.store.data_version()
+        if self.store.count() < 10:
+            table, daily = fct.fallback_snapshot()
+            version, updated_at = "fallback", ""
+        else:
+            table = self.store.query_table()
+            daily = self.store.daily_aggregates()
+            version = self.store.version()
+            updated_at = self.store.db.execute("SELECT MAX(last_seen) FROM trades").fetchone()[0] or ""
+        self.snapshot = TradeSnapshot(table, daily, version, updated_at)
+        print(f"📦 스냅샷 {version}: {len(table)}건, {len(daily)}일 ({time.perf_counter() - t0:.2f}s)")
+
+    def current(self):
+        now = time.monotonic()
+        if now - self.checked >= RELOAD_INTERVAL and self.lock.acquire(blocking=False):
+            try:
+                self.checked = now
+                if self.store.data_version() != self.data_version:
+                    self.reload()
+            except fct.sqlite3.Error as e:
+                print(f"❌ 저장소 확인 실패: {e}")
+            finally:
+                self.lock.release()
+        return self.snapshot
+
+    def close(self):
+        self.store.close()
+
+
+# ═══════════════════════════════════════════════
+# HTTP
+# ═══════════════════════════════════════════════
+def make_handler(service, root=BASE_DIR):
+    class Handler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kw):
+            super().__init__(*args, directory=root, **kw)
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            u = urlparse(self.path)
+            if u.path.startswith("/api/"):
+                self.api(u.path, dict(parse_qsl(u.query)))
+            elif u.path in ("/", "/index.html"):
+                self.send_index()
+            elif u.path.startswith(STATIC_FILES):
+                super().do_GET()
+            else:
+                self.send_error(404)
+
+        def api(self, path, params):
+            snap = service.current()
+            builders = {
+                "/api/summary": lambda: json.dumps(snap.summary, ensure_ascii=False).encode("utf-8"),
+                "/api/trades": lambda: snap.query(params),
+                "/api/stats": lambda: snap.stats(params),
+            }
+            if path not in builders:
+                self.send_json(404, {"error": f"알 수 없는 경로: {path}"})
+                return
+            try:
+                etag, body, gz = snap.cached((path, tuple(sorted(params.items()))), builders[path])
+            except QueryError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if gz is not None and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                body = gz
+                self.send_response(200)
+                self.send_header("Content-Encoding", "gzip")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_index(self):
+            """index.html의 ct-api 메타를 on으로 바꿔 서빙 → 페이지가 API 모드로 동작 (정적 배포는 off 그대로)"""
+            try:
+                with open(os.path.join(root, "index.html"), "rb") as f:
+                    body = f.read().replace(API_META_OFF, API_META_ON, 1)
+            except OSError:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, status, obj):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="의회 주식 거래 로컬 조회 서버")
+    ap.add_argument("--host", default="127.0.0.1", help="바인드 주소 (기본 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"포트 (기본 {DEFAULT_PORT})")
+    ap.add_argument("--store", default=fct.STORE_PATH, help="거래 저장소(SQLite) 경로")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = TradeService(args.store)
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"🌐 http://{args.host}:{httpd.server_address[1]}/  (Ctrl+C 종료)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 종료")
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""정치인 이름 식별(PoliticianResolver) + 소스 간 중복 제거(TradeDeduper)"""
+
+import unittest
+
+import fetch_congress_trades as fct
+
+INFO = {
+    "Rick Scott": {"party": "R", "sectors": ["에너지"]},
+    "Tim Scott": {"party": "R", "sectors": ["금융"]},
+    "Debbie Wasserman Schultz": {"party": "D"},
+    "Marjorie Taylor Greene": {"party": "R"},
+}
+ALIASES = {"Richard Scott": "Rick Scott", "Deborah Wasserman Schultz": "Debbie Wasserman Schultz",
+           "Nobody Here": "Not Listed"}
+EXTRA_PARTY = {"Scott": "R", "Green": "R"}
+
+
+class PoliticianResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.resolver = fct.PoliticianResolver(INFO, EXTRA_PARTY, ALIASES)
+
+    def name(self, raw):
+        pol = self.resolver.resolve(raw)
+        return pol.name if pol else None
+
+    def test_aliases(self):
+        self.assertEqual(self.name("Richard Scott"), "Rick Scott")
+        self.assertEqual(self.name("Deborah Wasserman Schultz"), "Debbie Wasserman Schultz")
+        self.assertIsNone(self.resolver.resolve("Nobody Here"))  # 정식 이름이 명단에 없는 별칭은 무시
+
+    def test_honorifics_case_and_initials(self):
+        for raw in ("RICK SCOTT", "Hon. Rick L. Scott Jr.", "R. Scott"):
+            self.assertEqual(self.name(raw), "Rick Scott", raw)
+        self.assertEqual(self.name("Timothy Scott"), "Tim Scott")
+
+    def test_compound_surname_alone(self):
+        pol = self.resolver.resolve("Wasserman Schultz")
+        self.assertEqual((pol.name, pol.party), ("Debbie Wasserman Schultz", "D"))
+
+    def test_ambiguous_surname_falls_back_to_party(self):
+        pol = self.resolver.resolve("Scott")
+        self.assertEqual((pol.name, pol.party, pol.sectors), (None, "R", ()))
+
+    def test_tokens_not_substrings(self):
+        self.assertEqual(self.name("Marjorie Greene"), "Marjorie Taylor Greene")
+        self.assertIsNone(self.name("Mark Green"))  # "Green" ≠ "Greene" → 정당만
+        self.assertEqual(self.resolver.resolve("Mark Green").party, "R")
+        self.assertIsNone(self.resolver.resolve(""))
+
+
+def trade(tid, source, date, rep="Rick Scott", ticker="NVDA", type="buy", owner="Self", amount_mid=8000):
+    return {"id": tid, "source": source, "rep": rep, "ticker": ticker, "date": date,
+            "type": type, "owner": owner, "amount_mid": amount_mid}
+
+
+class TradeDeduperTest(unittest.TestCase):
+    def dedupe(self, incoming, existing):
+        kept, drop, merges = fct.TradeDeduper(existing).dedupe(incoming)
+        return [t["id"] for t in kept], drop, dict(merges)
+
+    def test_higher_priority_source_replaces_existing(self):
+        self.assertEqual(self.dedupe([trade("ct1", "capitol_trades", "2024-03-05")],
+                                     [trade("gs1", "github_senate", "2024-03-05")]),
+                         (["ct1"], ["gs1"], {"github_senate": 1}))
+
+    def test_lower_priority_source_is_dropped(self):
+        self.assertEqual(self.dedupe([trade("gs1", "github_senate", "2024-03-05")],
+                                     [trade("ct1", "capitol_trades", "2024-03-05")]),
+                         ([], [], {"github_senate": 1}))
+
+    def test_date_tolerance_is_one_day(self):
+        existing = [trade("gs1", "github_senate", "2024-03-01")]
+        for date in ("2024-02-29", "2024-03-02"):  # 윤년/월 경계
+            self.assertEqual(self.dedupe([trade("ct1", "capitol_trades", date)], existing)[1], ["gs1"], date)
+        self.assertEqual(self.dedupe([trade("ct1", "capitol_trades", "2024-03-03")], existing),
+                         (["ct1"], [], {}))
+
+    def test_same_source_repeats_are_kept(self):
+        existing = [trade("ct1", "capitol_trades", "2024-03-05")]
+        self.assertEqual(self.dedupe([trade("ct2", "capitol_trades", "2024-03-05")], existing),
+                         (["ct2"], [], {}))
+
+    def test_alias_names_match(self):
+        self.assertEqual(fct.member_key("Richard Scott"), fct.member_key("Rick Scott"))
+        self.assertEqual(self.dedupe([trade("ct1", "capitol_trades", "2024-03-05", rep="Richard Scott")],
+                                     [trade("gs1", "github_senate", "2024-03-05")])[1], ["gs1"])
+
+    def test_type_owner_and_amount_band_must_agree(self):
+        existing = [trade("gs1", "github_senate", "2024-03-05")]
+        for t in (trade("ct1", "capitol_trades", "2024-03-05", type="sell"),
+                  trade("ct1", "capitol_trades", "2024-03-05", owner="Spouse"),
+                  trade("ct1", "capitol_trades", "2024-03-05", amount_mid=32500),
+                  trade("ct1", "capitol_trades", "2024-03-05", ticker="AAPL")):
+            self.assertEqual(self.dedupe([t], existing), (["ct1"], [], {}), t)
+
+    def test_owner_aliases_and_missing_values_match(self):
+        existing = [trade("gs1", "github_senate", "2024-03-05", owner="Spouse")]
+        for t in (trade("ct1", "capitol_trades", "2024-03-05", owner="SP"),
+                  trade("ct1", "capitol_trades", "2024-03-05", owner=""),
+                  trade("ct1", "capitol_trades", "2024-03-05", owner="Spouse", amount_mid=0)):
+            self.assertEqual(self.dedupe([t], existing)[1], ["gs1"], t)
+
+    def test_existing_record_matches_once(self):
+        """같은 날 같은 종목 두 건 vs 기존 한 건 → 한 건만 병합"""
+        incoming = [trade("ct1", "capitol_trades", "2024-03-05"), trade("ct2", "capitol_trades", "2024-03-05")]
+        self.assertEqual(self.dedupe(incoming, [trade("gs1", "github_senate", "2024-03-05")]),
+                         (["ct1", "ct2"], ["gs1"], {"github_senate": 1}))
+
+    def test_dedupe_batch_matches_deduper(self):
+        incoming = [trade("ct1", "capitol_trades", "2024-03-05"), trade("gs2", "github_senate", "2024-03-07")]
+        existing = [trade("gs1", "github_senate", "2024-03-04"), trade("ct9", "capitol_trades", "2024-03-08")]
+        kept, drop, merges = fct.dedupe_batch(incoming, existing)
+        self.assertEqual(([t["id"] for t in kept], drop, dict(merges)),
+                         (["ct1"], ["gs1"], {"github_senate": 2}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""가격 CSV → .bin 변환 + 종가 조회 (bench/fixtures/prices 번들 fixture 사용)"""
+
+import bisect
+import os
+import shutil
+import tempfile
+import unittest
+
+import fetch_congress_trades as fct
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench", "fixtures", "prices")
+
+
+class PriceIngestTest(unittest.TestCase):
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="ct-prices-")
+        self.addCleanup(shutil.rmtree, self.work, True)
+        self.names = sorted(n[:-4].upper() for n in os.listdir(FIXTURE_DIR) if n.lower().endswith(".csv"))
+        self.assertEqual(fct.ingest_prices(FIXTURE_DIR, self.work), len(self.names))
+        self.store = fct.PriceStore(self.work)
+        self.addCleanup(self.store.close)
+
+    def test_unchanged_csv_is_not_converted_again(self):
+        self.assertEqual(fct.ingest_prices(FIXTURE_DIR, self.work), 0)
+
+    def test_tickers_lists_converted_files(self):
+        self.assertEqual(self.store.tickers(), self.names)
+        self.assertIsNone(self.store.get("ZZZZ"))
+
+    def test_every_day_matches_csv(self):
+        """첫 거래일 전날 ~ 마지막 거래일 + 허용 일수 + 1일: 당일 또는 허용 일수 이내 직전 종가, 없으면 None"""
+        tol = fct.PRICE_TOLERANCE_DAYS
+        for tk in self.names:
+            rows = sorted(fct.read_price_csv(os.path.join(FIXTURE_DIR, f"{tk}.csv")))
+            days = [d for d, _ in rows]
+            series = self.store.get(tk)
+            for day in range(days[0] - 1, days[-1] + tol + 2):
+                i = bisect.bisect_right(days, day) - 1
+                want = round(rows[i][1], 2) if i >= 0 and day - days[i] <= tol else None
+                self.assertEqual(series.close_on_day(day), want, f"{tk} {fct.day_string(day)}")
+
+    def test_holiday_uses_previous_close(self):
+        series = self.store.get("NVDA")
+        self.assertEqual(series.close_on("2024-01-15"), 48.02)  # MLK 데이 → 2024-01-12 금요일 종가
+        self.assertEqual(series.close_on("2024-01-16"), 46.98)
+        self.assertIsNone(series.close_on("2024-01-01"))
+        self.assertIsNone(series.close_on("not-a-date"))
+
+    def test_annotate(self):
+        t = self.store.annotate({"ticker": "NVDA", "date": "2024-01-13", "disclosure_date": ""})
+        self.assertEqual((t["price"], t["disclosure_price"]), (48.02, None))
+        t = self.store.annotate({"ticker": "ZZZZ", "date": "2024-01-13", "disclosure_date": ""})
+        self.assertIsNone(t["price"])
+
+
+if __name__ == "__main__":
+    unittest.main()
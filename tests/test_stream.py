@@ -0,0 +1,63 @@
+"""iter_json_array: 청크 경계(멀티바이트 문자/숫자/문자열 중간)에서 잘려도 json.loads와 같은 결과"""
+
+import io
+import json
+import unittest
+
+import fetch_congress_trades as fct
+
+PAYLOAD = [
+    {"id": "a1", "rep": "김의원 \"따옴표\" \\ 역슬래시", "amount_mid": 8000, "conflict": False},
+    {"id": "a2", "price": 1.5e3, "neg": -0.25, "big": 12345678901234, "none": None},
+    [1, 22, 333, [], {}],
+    "문자열 원소",
+    12.75,
+    {"nested": {"list": [{"x": "é"}, {"y": "😀"}]}},
+    7,
+]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def parse(self, raw, chunk_size):
+        return list(fct.iter_json_array(io.BytesIO(raw), chunk_size=chunk_size))
+
+    def test_every_chunk_size_matches_json_loads(self):
+        for text in (json.dumps(PAYLOAD, ensure_ascii=False),
+                     json.dumps(PAYLOAD, ensure_ascii=False, indent=2),
+                     json.dumps(PAYLOAD, separators=(",", ":"))):
+            raw = text.encode("utf-8")
+            for size in list(range(1, 24)) + [64, len(raw), fct.STREAM_CHUNK]:
+                self.assertEqual(self.parse(raw, size), PAYLOAD, f"chunk_size={size}")
+
+    def test_trailing_number_split_at_boundary(self):
+        raw = b"[1, 22, 333.5e1]"
+        for size in range(1, len(raw) + 1):
+            self.assertEqual(self.parse(raw, size), [1, 22, 3335.0], f"chunk_size={size}")
+
+    def test_bom_whitespace_and_empty(self):
+        self.assertEqual(self.parse("\ufeff \n[ ]\n".encode("utf-8"), 1), [])
+        self.assertEqual(self.parse(b"\r\n\t[\n{\"a\" : 1}\n,\n2 ]", 3), [{"a": 1}, 2])
+
+    def test_malformed(self):
+        for raw in (b'{"a": 1}', b"[1, 2", b"[1 2]", b"", b"[1, {]"):
+            with self.assertRaises(ValueError, msg=raw):
+                self.parse(raw, 2)
+
+    def test_yields_lazily(self):
+        """첫 원소는 배열 끝까지 읽기 전에 나온다"""
+        class Stream(io.BytesIO):
+            reads = 0
+
+            def read(self, n=-1):
+                Stream.reads += 1
+                return super().read(n)
+
+        raw = json.dumps([{"i": i} for i in range(1000)]).encode("utf-8")
+        it = fct.iter_json_array(Stream(raw), chunk_size=64)
+        self.assertEqual(next(it), {"i": 0})
+        self.assertLess(Stream.reads, 4)
+        self.assertEqual(sum(1 for _ in it), 999)
+
+
+if __name__ == "__main__":
+    unittest.main()
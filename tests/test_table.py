@@ -0,0 +1,124 @@
+"""TradeTable 컬럼형 직렬화 + TradeAggregate 부분 집계 병합 + 최근 구간 요약"""
+
+import json
+import random
+import unittest
+from datetime import date, timedelta
+
+import fetch_congress_trades as fct
+
+REPS = [("Nancy Pelosi", "D"), ("Dan Crenshaw", "R"), ("김 의원 \"별칭\"", None), ("Tommy Tuberville", "R")]
+TICKERS = [("NVDA", "NVIDIA Corp", "반도체"), ("AAPL", "Apple Inc", "기술"),
+           ("XOM", "Exxon \\ Mobil", "에너지"), ("ZZZ", "Unknown Co", "기타")]
+
+
+def make_trades(n, seed=7):
+    """TRADE_FIELDS 순서의 거래 n건 (날짜 없음/비 ISO 날짜/가격 없음 포함)"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    trades = []
+    for i in range(n):
+        rep, party = rng.choice(REPS)
+        tk, asset, sector = rng.choice(TICKERS)
+        r = rng.random()
+        day = "" if r < 0.05 else "2024-02-30" if r < 0.08 else (start + timedelta(days=rng.randint(0, 500))).isoformat()
+        mid = rng.choice([0, 8000, 32500, 75000, 3000000])
+        trades.append({
+            "id": f"t{i}", "source": rng.choice(["capitol_trades", "github_senate"]),
+            "rep": rep, "party": party, "ticker": tk, "asset": asset,
+            "type": rng.choice(["buy", "sell"]), "amount": f"${mid:,}", "amount_mid": mid,
+            "date": day, "disclosure_date": "" if not day else day,
+            "sector": sector, "conflict": rng.random() < 0.2,
+            "chamber": rng.choice(["house", "senate"]), "owner": rng.choice(["Self", "Spouse", ""]),
+        })
+    return trades
+
+
+class TradeTableTest(unittest.TestCase):
+    def test_to_json_round_trip(self):
+        trades = make_trades(300)
+        table = fct.TradeTable.from_trades(trades)
+        self.assertEqual(table.to_dicts(), trades)
+        self.assertEqual(json.loads(table.to_json()), table.to_dicts())
+        self.assertEqual(table.to_json(), json.dumps(trades, ensure_ascii=False, separators=(",", ":")))
+
+    def test_to_json_with_prices_and_subtables(self):
+        trades = make_trades(50)
+        for i, t in enumerate(trades):
+            t["price"] = None if i % 3 else 100.25 + i
+        table = fct.TradeTable.from_trades(trades)
+        self.assertEqual(json.loads(table.to_json()), trades)
+        ordered = table.sorted_by("date", reverse=True)
+        self.assertEqual(json.loads(ordered.to_json()), ordered.to_dicts())
+        self.assertEqual(json.loads(table[10:20].to_json()), trades[10:20])
+
+    def test_from_rows_matches_from_trades(self):
+        trades = make_trades(100)
+        rows = [tuple(t[k] for k in fct.TRADE_FIELDS) for t in trades]
+        self.assertEqual(fct.TradeTable.from_rows(rows).to_json(), fct.TradeTable.from_trades(trades).to_json())
+
+    def test_empty(self):
+        self.assertEqual(fct.TradeTable().to_json(), "[]")
+
+
+class TradeAggregateTest(unittest.TestCase):
+    def setUp(self):
+        self.trades = make_trades(400, seed=11)
+        self.whole = fct.TradeAggregate.from_trades(self.trades).to_dict()
+
+    def test_merge_in_any_order_equals_single_pass(self):
+        parts = [self.trades[i::3] for i in range(3)]
+        for order in ((0, 1, 2), (2, 0, 1), (1, 2, 0)):
+            agg = fct.TradeAggregate()
+            for i in order:
+                agg.merge(fct.TradeAggregate.from_trades(parts[i]))
+            self.assertEqual(agg.to_dict(), self.whole, order)
+
+    def test_from_table_and_dict_round_trip(self):
+        table = fct.TradeTable.from_trades(self.trades)
+        self.assertEqual(fct.TradeAggregate.from_table(table).to_dict(), self.whole)
+        restored = fct.TradeAggregate.from_dict(json.loads(json.dumps(self.whole, ensure_ascii=False)))
+        self.assertEqual(restored.to_dict(), self.whole)
+        self.assertEqual(restored.stats(), fct.compute_stats(self.trades))
+
+    def test_merge_does_not_alias_source(self):
+        a, b = fct.TradeAggregate.from_trades(self.trades[:10]), fct.TradeAggregate.from_trades(self.trades[10:20])
+        before = b.to_dict()
+        fct.TradeAggregate().merge(b).merge(a)
+        self.assertEqual(b.to_dict(), before)
+
+
+class WindowSummariesTest(unittest.TestCase):
+    def setUp(self):
+        self.trades = make_trades(400, seed=3)
+        days = {}
+        for t in self.trades:
+            days.setdefault(t["date"], []).append(t)
+        self.daily = {d: fct.TradeAggregate.from_trades(ts) for d, ts in days.items()}
+
+    def expected(self, today, days):
+        cutoff = (today - timedelta(days=days)).isoformat()
+        return fct.TradeAggregate.from_trades(t for t in self.trades if t["date"] >= cutoff).summary()
+
+    def test_anchored_to_latest_valid_date(self):
+        latest = max(t["date"] for t in self.trades if fct.day_number(t["date"]) is not None)
+        today = date.fromisoformat(latest)
+        out = fct.window_summaries(self.daily)
+        self.assertEqual(set(out), {f"{d}d" for d in fct.STAT_WINDOWS})
+        for days in fct.STAT_WINDOWS:
+            self.assertEqual(out[f"{days}d"], self.expected(today, days), days)
+        self.assertLess(out["30d"]["trades"], out["365d"]["trades"])
+
+    def test_explicit_today(self):
+        today = date(2024, 6, 30)
+        out = fct.window_summaries(self.daily, today=fct.datetime(2024, 6, 30))
+        self.assertEqual(out["90d"], self.expected(today, 90))
+
+    def test_no_valid_dates(self):
+        out = fct.window_summaries({"": fct.TradeAggregate.from_trades(make_trades(3))})
+        self.assertEqual(out["30d"], fct.TradeAggregate().summary())
+        self.assertEqual(fct.window_summaries({}), out)
+
+
+if __name__ == "__main__":
+    unittest.main()